@@ -1,87 +1,172 @@
-# This file initializes the ADK system and registers all agents.
-
-from google.adk.resolver import Resolver
-from google.cloud.aiplatform_v1beta1 import PredictionServiceClient
-from typing import Dict, Any, Optional
-
-# Import all your agents
-from .agents.base_agent import BaseConstructionAgent
-from .agents.strategic_client_engagement_agent import StrategicClientEngagementAgent
-from .agents.site_intelligence_regulatory_compliance_agent import SiteIntelligenceRegulatoryComplianceAgent
-from .agents.generative_architectural_design_agent import GenerativeArchitecturalDesignAgent
-from .agents.integrated_systems_engineering_agent import IntegratedSystemsEngineeringAgent
-from .agents.interior_experiential_design_agent import InteriorExperientialDesignAgent
-from .agents.hyper_realistic_3d_digital_twin_agent import HyperRealistic3DDigitalTwinAgent
-from .agents.predictive_cost_supply_chain_agent import PredictiveCostSupplyChainAgent
-from .agents.adaptive_project_management_robotics_orchestration_agent import AdaptiveProjectManagementRoboticsOrchestrationAgent
-from .agents.proactive_risk_safety_management_agent import ProactiveRiskSafetyManagementAgent
-from .agents.ai_driven_quality_assurance_control_agent import AIDrivenQualityAssuranceControlAgent
-from .agents.semantic_data_integration_ontology_agent import SemanticDataIntegrationOntologyAgent
-from .agents.learning_adaptation_agent import LearningAdaptationAgent
-from .agents.human_ai_collaboration_explainability_agent import HumanAICollaborationExplainabilityAgent
-from .agents.sustainability_green_building_agent import SustainabilityGreenBuildingAgent
-from .agents.financial_investment_analysis_agent import FinancialInvestmentAnalysisAgent
-from .agents.legal_contract_management_agent import LegalContractManagementAgent
-from .agents.workforce_management_hr_agent import WorkforceManagementHRAgent
-from .agents.post_construction_facility_management_agent import PostConstructionFacilityManagementAgent
-from .agents.public_relations_stakeholder_communication_agent import PublicRelationsStakeholderCommunicationAgent
-
-from ..config.settings import settings # Import global settings
-
-# Global variables to hold initialized agents and resolver
-_adk_agents: Optional[Dict[str, BaseConstructionAgent]] = None
-_resolver: Optional[Resolver] = None
-
-def initialize_adk_system_with_agents():
-    """
-    Initializes the ADK system and registers all defined agents.
-    This function is designed to be called once during application startup.
-    """
-    global _adk_agents, _resolver
-
-    if _resolver is None: # Only initialize if not already initialized
-        # Initialize PredictionServiceClient with correct API endpoint based on location
-        client_options = {"api_endpoint": f"{settings.LOCATION}-aiplatform.googleapis.com"}
-        prediction_service_client = PredictionServiceClient(client_options=client_options)
-
-        _resolver = Resolver(
-            project_id=settings.PROJECT_ID,
-            location=settings.LOCATION,
-            prediction_service_client=prediction_service_client,
-            model_name=settings.GEMINI_MODEL_NAME
-        )
-
-        # Instantiate and register all your specialized agents
-        _adk_agents = {
-            "strategic_client_engagement_agent": StrategicClientEngagementAgent(resolver=_resolver),
-            "site_intelligence_regulatory_compliance_agent": SiteIntelligenceRegulatoryComplianceAgent(resolver=_resolver),
-            "generative_architectural_design_agent": GenerativeArchitecturalDesignAgent(resolver=_resolver),
-            "integrated_systems_engineering_agent": IntegratedSystemsEngineeringAgent(resolver=_resolver),
-            "interior_experiential_design_agent": InteriorExperientialDesignAgent(resolver=_resolver),
-            "hyper_realistic_3d_digital_twin_agent": HyperRealistic3DDigitalTwinAgent(resolver=_resolver),
-            "predictive_cost_supply_chain_agent": PredictiveCostSupplyChainAgent(resolver=_resolver),
-            "adaptive_project_management_robotics_orchestration_agent": AdaptiveProjectManagementRoboticsOrchestrationAgent(resolver=_resolver),
-            "proactive_risk_safety_management_agent": ProactiveRiskSafetyManagementAgent(resolver=_resolver),
-            "ai_driven_quality_assurance_control_agent": AIDrivenQualityAssuranceControlAgent(resolver=_resolver),
-            "semantic_data_integration_ontology_agent": SemanticDataIntegrationOntologyAgent(resolver=_resolver),
-            "learning_adaptation_agent": LearningAdaptationAgent(resolver=_resolver),
-            "human_ai_collaboration_explainability_agent": HumanAICollaborationExplainabilityAgent(resolver=_resolver),
-            "sustainability_green_building_agent": SustainabilityGreenBuildingAgent(resolver=_resolver),
-            "financial_investment_analysis_agent": FinancialInvestmentAnalysisAgent(resolver=_resolver),
-            "legal_contract_management_agent": LegalContractManagementAgent(resolver=_resolver),
-            "workforce_management_hr_agent": WorkforceManagementHRAgent(resolver=_resolver),
-            "post_construction_facility_management_agent": PostConstructionFacilityManagementAgent(resolver=_resolver),
-            "public_relations_stakeholder_communication_agent": PublicRelationsStakeholderCommunicationAgent(resolver=_resolver),
-        }
-        print(f"ADK system initialized with model: {settings.GEMINI_MODEL_NAME} in location: {settings.LOCATION}")
-        print(f"Successfully registered ADK agents: {list(_adk_agents.keys())}")
-    return _adk_agents, _resolver
-
-def get_adk_system() -> (Dict[str, BaseConstructionAgent], Resolver):
-    """
-    Provides access to the initialized ADK agents map and resolver.
-    Ensures initialization happens if it hasn't already.
-    """
-    if _adk_agents is None or _resolver is None:
-        initialize_adk_system_with_agents()
-    return _adk_agents, _resolver
\ No newline at end of file
+# This file initializes the ADK system and registers all agents.
+
+import importlib
+import pkgutil
+import threading
+from google.adk.resolver import Resolver
+from google.cloud.aiplatform_v1beta1 import PredictionServiceClient
+from google.cloud.aiplatform_v1beta1.services.prediction_service.transports import PredictionServiceGrpcTransport
+from typing import Dict, Any, Optional, List, Callable
+
+from . import agents as agents_package
+from .agents.base_agent import BaseConstructionAgent
+from .services.gemini_service import get_gemini_service
+from ..config.settings import settings # Import global settings
+
+def _discover_agent_keys() -> List[str]:
+    """
+    Returns the registry keys of all agents: the names of the `*_agent` modules under
+    `adk_core.agents`, found without importing them. Each module defines one
+    BaseConstructionAgent subclass, which registers itself when the module is imported.
+    """
+    return sorted(
+        module_name for _, module_name, _ in pkgutil.iter_modules(agents_package.__path__)
+        if module_name.endswith("_agent") and module_name != "base_agent"
+    )
+
+# gRPC channel options for the shared Vertex AI connection. Keepalive keeps the
+# HTTP/2 connection warm between requests, and the stream limit lets concurrently
+# dispatched agents multiplex their calls over it.
+GRPC_CHANNEL_OPTIONS = [
+    ("grpc.max_concurrent_streams", 1000),
+    ("grpc.keepalive_time_ms", 20000),
+    ("grpc.http2.max_pings_without_data", 0), # Keepalive pings are not capped while the connection is idle between requests
+]
+
+# A gRPC channel is thread-safe, so a single one serves every client and thread.
+_grpc_channel = None
+_grpc_channel_lock = threading.Lock()
+
+def _get_grpc_channel():
+    """Returns the process-wide authenticated gRPC channel to the Vertex AI endpoint, creating it on first use."""
+    global _grpc_channel
+    if _grpc_channel is None:
+        with _grpc_channel_lock:
+            if _grpc_channel is None: # Re-check, another thread may have created it
+                _grpc_channel = PredictionServiceGrpcTransport.create_channel(
+                    f"{settings.LOCATION}-aiplatform.googleapis.com:443",
+                    options=GRPC_CHANNEL_OPTIONS,
+                )
+    return _grpc_channel
+
+def _build_prediction_service_client() -> PredictionServiceClient:
+    """
+    Builds a PredictionServiceClient on the shared gRPC channel, using the correct
+    API endpoint based on location. Clients are cheap stub wrappers, so callers that
+    need per-thread isolation can each build one without opening new connections.
+    """
+    transport = PredictionServiceGrpcTransport(
+        host=f"{settings.LOCATION}-aiplatform.googleapis.com",
+        channel=_get_grpc_channel(),
+    )
+    return PredictionServiceClient(transport=transport)
+
+class LazyAgentRegistry(dict):
+    """
+    Agent map that imports and constructs each agent on first access and caches it.
+    Requests that only exercise a subset of agents never load or build the others.
+    Membership, iteration and length reflect all registered agents, built or not.
+    """
+    def __init__(self, resolver: Resolver, agent_keys: List[str]):
+        super().__init__()
+        self._resolver = resolver
+        self._agent_keys: Dict[str, None] = dict.fromkeys(agent_keys) # Ordered set of registered keys
+        self._lock = threading.Lock() # Agents may be requested from several threads at once
+
+    def __missing__(self, agent_key: str) -> BaseConstructionAgent:
+        if agent_key not in self._agent_keys:
+            raise KeyError(agent_key)
+        with self._lock:
+            if not dict.__contains__(self, agent_key): # Re-check, another thread may have built it
+                importlib.import_module(f".agents.{agent_key}", package=__name__) # Registers the agent class
+                agent_class = BaseConstructionAgent._registry[agent_key]
+                dict.__setitem__(self, agent_key, agent_class(resolver=self._resolver))
+        return dict.__getitem__(self, agent_key)
+
+    def get(self, agent_key: str, default: Any = None) -> Optional[BaseConstructionAgent]:
+        return self[agent_key] if agent_key in self._agent_keys else default
+
+    def __contains__(self, agent_key: object) -> bool:
+        return agent_key in self._agent_keys
+
+    def __len__(self) -> int:
+        return len(self._agent_keys)
+
+    def __iter__(self):
+        return iter(self._agent_keys)
+
+    def keys(self):
+        return self._agent_keys.keys()
+
+    def values(self):
+        return [self[agent_key] for agent_key in self._agent_keys]
+
+    def items(self):
+        return [(agent_key, self[agent_key]) for agent_key in self._agent_keys]
+
+# Global variables to hold initialized agents and resolver
+_adk_agents: Optional[Dict[str, BaseConstructionAgent]] = None
+_resolver: Optional[Resolver] = None
+# Agent metadata as index-aligned parallel lists, built on first use by `get_agent_soa`
+_agent_soa: Optional[Dict[str, List[Any]]] = None
+_agent_soa_lock = threading.Lock()
+
+def initialize_adk_system_with_agents():
+    """
+    Initializes the ADK system and registers all defined agents.
+    Agents are registered lazily and only constructed when first looked up.
+    This function is designed to be called once during application startup.
+    """
+    global _adk_agents, _resolver
+
+    if _resolver is None: # Only initialize if not already initialized
+        # Initialize the pooled PredictionServiceClient shared by the resolver and GeminiService
+        prediction_service_client = _build_prediction_service_client()
+
+        _resolver = Resolver(
+            project_id=settings.PROJECT_ID,
+            location=settings.LOCATION,
+            prediction_service_client=prediction_service_client,
+            model_name=settings.GEMINI_MODEL_NAME
+        )
+        # Create the shared GeminiService up front so it reuses this client
+        get_gemini_service(prediction_service_client=prediction_service_client)
+
+        # Register all your specialized agents
+        _adk_agents = LazyAgentRegistry(resolver=_resolver, agent_keys=_discover_agent_keys())
+        print(f"ADK system initialized with model: {settings.GEMINI_MODEL_NAME} in location: {settings.LOCATION}")
+        print(f"Successfully registered ADK agents: {list(_adk_agents.keys())}")
+    return _adk_agents, _resolver
+
+def get_adk_system() -> (Dict[str, BaseConstructionAgent], Resolver):
+    """
+    Provides access to the initialized ADK agents map and resolver.
+    Ensures initialization happens if it hasn't already.
+    """
+    if _adk_agents is None or _resolver is None:
+        initialize_adk_system_with_agents()
+    return _adk_agents, _resolver
+
+def get_agent_soa() -> Dict[str, List[Any]]:
+    """
+    Provides agent metadata as parallel lists ('keys', 'names', 'descriptions', 'process_fns'),
+    where index i describes the same agent in every list. Loops that scan all agents
+    can walk these lists instead of dereferencing each agent instance.
+    Constructs every agent on first call; use the agents map for by-key lookup.
+    """
+    global _agent_soa
+    if _agent_soa is None:
+        adk_agents, _ = get_adk_system()
+        with _agent_soa_lock:
+            if _agent_soa is None: # Re-check, another thread may have built it
+                agents = list(adk_agents.items())
+                process_fns: List[Callable[[Dict[str, Any]], Dict[str, Any]]] = [
+                    agent.process_request for _, agent in agents
+                ]
+                _agent_soa = {
+                    "keys": [agent_key for agent_key, _ in agents],
+                    "names": [agent.name for _, agent in agents],
+                    "descriptions": [agent.description for _, agent in agents],
+                    "process_fns": process_fns,
+                }
+    return _agent_soa
@@ -1,99 +1,115 @@
-import logging
-import json
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-
-logger = logging.getLogger(__name__)
-
-class AdaptiveProjectManagementRoboticsOrchestrationAgent(BaseConstructionAgent):
-    """
-    Manages the overall project plan, orchestrates tasks across other agents,
-    integrates data, and prepares project summaries. It's designed to adapt
-    to changes and oversee project execution.
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Adaptive Project Management & Robotics Orchestration Agent",
-            description="Manages project planning, scheduling, and overall coordination.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Coordinates and drafts the master project plan based on inputs from other agents.
-        """
-        project_id = user_input.get("project_id")
-        # Gather outputs from other agents
-        cost_supply_chain_analysis = user_input.get("cost_supply_chain_analysis", {})
-        estimated_schedule = user_input.get("estimated_schedule", {})
-        site_report = user_input.get("site_feasibility_report", {})
-        architectural_concept = user_input.get("architectural_concept", {})
-        project_description = user_input.get("project_description", "a construction project")
-
-        logger.info(f"Project Management Agent: Kicking off initial planning for {project_id}.")
-
-        try:
-            # Use Gemini to synthesize a master project plan
-            prompt = (
-                f"As a senior project manager for a construction project, synthesize a master project plan "
-                f"for '{project_description}'. Integrate the following information: "
-                f"\n- Estimated Budget: {cost_supply_chain_analysis.get('total_estimated_cost_usd', 'N/A')}"
-                f"\n- Cost Breakdown: {json.dumps(cost_supply_chain_analysis.get('cost_breakdown', {}))}"
-                f"\n- Procurement Strategy: {cost_supply_chain_analysis.get('procurement_strategy', 'N/A')}"
-                f"\n- Total Duration: {estimated_schedule.get('total_duration_weeks', 'N/A')} weeks"
-                f"\n- Key Milestones: {json.dumps(estimated_schedule.get('milestones', []))}"
-                f"\n- Site Considerations: {site_report.get('regulatory_summary_ai', 'N/A')}"
-                f"\n- Architectural Style: {architectural_concept.get('design_style_summary', 'N/A')}"
-                f"\n\nBased on this, outline a master plan including key phases, potential risks, "
-                f"and next steps for client approval. "
-                f"Output STRICTLY as a JSON object with keys: 'status', 'budget_summary', 'timeline_summary', "
-                f"'key_milestones_overview', 'risks_identified' (list of strings), 'next_steps' (list of strings)."
-            )
-            llm_response = self.gemini_service.generate_text(prompt, temperature=0.4)
-
-            if llm_response is None:
-                return {
-                    "agent_name": self.name,
-                    "status": "error",
-                    "message": "LLM did not generate a valid response for project plan."
-                }
-
-            try:
-                simulated_master_plan = json.loads(llm_response)
-                # Basic validation
-                if not isinstance(simulated_master_plan, dict) or \
-                   'status' not in simulated_master_plan or \
-                   'budget_summary' not in simulated_master_plan or \
-                   'timeline_summary' not in simulated_master_plan or \
-                   'key_milestones_overview' not in simulated_master_plan:
-                    raise ValueError("LLM response JSON is not in the expected project plan format.")
-            except json.JSONDecodeError:
-                logger.error(f"Project Management Agent: Gemini response was not valid JSON: {llm_response}. Using fallback data.")
-                simulated_master_plan = {
-                    "status": "master_plan_drafted_with_errors",
-                    "budget_summary": f"Approx. ${cost_supply_chain_analysis.get('total_estimated_cost_usd', 'N/A')} (parsing error)",
-                    "timeline_summary": f"{estimated_schedule.get('total_duration_weeks', 'N/A')} weeks (parsing error)",
-                    "key_milestones_overview": "Milestones parsing failed.",
-                    "risks_identified": ["LLM response parsing failed, manual risk review needed."],
-                    "next_steps": ["Review generated output manually."]
-                }
-
-            simulated_master_plan["project_id"] = project_id
-            logger.info(f"Project Management Agent: Master plan drafted for {project_id}.")
-
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "master_project_plan": simulated_master_plan
-            }
-
-        except Exception as e:
-            logger.error(f"Project Management Agent: Error during project planning: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed project planning for {project_id}: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import logging
+import orjson
+from typing import Dict, Any
+
+from .base_agent import BaseConstructionAgent
+from .schemas import MasterPlan
+
+logger = logging.getLogger(__name__)
+
+# Static instructions, served from Gemini context caching so they are not re-sent per request.
+_SYSTEM_INSTRUCTION = (
+    "As a senior project manager for a construction project, synthesize a master project plan "
+    "from the project information provided. Outline a master plan including key phases, potential risks, "
+    "and next steps for client approval."
+)
+
+# Static prompt skeleton; only the placeholders are filled in per request.
+_PROMPT_TEMPLATE = (
+    "Project: '{project_description}'. Integrate the following information: "
+    "\n- Estimated Budget: {budget}"
+    "\n- Cost Breakdown: {cost_breakdown}"
+    "\n- Procurement Strategy: {procurement_strategy}"
+    "\n- Total Duration: {total_duration_weeks} weeks"
+    "\n- Key Milestones: {milestones}"
+    "\n- Site Considerations: {site_considerations}"
+    "\n- Architectural Style: {architectural_style}"
+)
+
+class AdaptiveProjectManagementRoboticsOrchestrationAgent(BaseConstructionAgent):
+    """
+    Manages the overall project plan, orchestrates tasks across other agents,
+    integrates data, and prepares project summaries. It's designed to adapt
+    to changes and oversee project execution.
+    """
+    __slots__ = ()
+    input_keys = ("project_id", "site_feasibility_report", "architectural_concept", "cost_supply_chain_analysis", "estimated_schedule")
+    output_keys = ("master_project_plan",)
+    _required_inputs = ("cost_supply_chain_analysis.total_estimated_cost_usd",)
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Adaptive Project Management & Robotics Orchestration Agent",
+            description="Manages project planning, scheduling, and overall coordination.",
+            resolver=resolver
+        )
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Coordinates and drafts the master project plan based on inputs from other agents.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Coordinates and drafts the master project plan based on inputs from other agents.
+        """
+        project_id = user_input.get("project_id")
+        cost_supply_chain_analysis = user_input.get("cost_supply_chain_analysis", {})
+        estimated_schedule = user_input.get("estimated_schedule", {})
+
+        missing_inputs = self._missing_required_inputs(user_input)
+        if missing_inputs:
+            logger.info("Project Management Agent: Skipping planning for %s, missing upstream data: %s.", project_id, missing_inputs)
+            return self._skipped_for_missing_inputs(missing_inputs)
+
+        logger.info("Project Management Agent: Kicking off initial planning for %s.", project_id)
+
+        try:
+            # Used when the LLM response is not a valid project plan
+            fallback_plan = {
+                "status": "master_plan_drafted_with_errors",
+                "budget_summary": f"Approx. ${cost_supply_chain_analysis.get('total_estimated_cost_usd', 'N/A')} (parsing error)",
+                "timeline_summary": f"{estimated_schedule.get('total_duration_weeks', 'N/A')} weeks (parsing error)",
+                "key_milestones_overview": "Milestones parsing failed.",
+                "risks_identified": ["LLM response parsing failed, manual risk review needed."],
+                "next_steps": ["Review generated output manually."]
+            }
+            # Use Gemini to synthesize a master project plan
+            parsed_plan = await self._generate_json(**self.build_text_request(user_input), fallback=fallback_plan)
+            if parsed_plan is None:
+                return self._error("LLM did not generate a valid response for project planning.")
+
+            simulated_master_plan = {**parsed_plan, "project_id": project_id}
+            logger.info("Project Management Agent: Master plan drafted for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "master_project_plan": simulated_master_plan
+            }
+
+        except (AttributeError, KeyError, TypeError, ValueError) as e: # Malformed input data; other errors reach the orchestrator
+            logger.error("Project Management Agent: Error during project planning: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed project planning for {project_id}: {e}")
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the Gemini request synthesizing the master project plan."""
+        cost_supply_chain_analysis = user_input.get("cost_supply_chain_analysis", {})
+        estimated_schedule = user_input.get("estimated_schedule", {})
+        site_report = user_input.get("site_feasibility_report", {})
+        architectural_concept = user_input.get("architectural_concept", {})
+        prompt = _PROMPT_TEMPLATE.format_map({
+            "project_description": user_input.get("project_description", "a construction project"),
+            "budget": cost_supply_chain_analysis.get('total_estimated_cost_usd', 'N/A'),
+            "cost_breakdown": orjson.dumps(cost_supply_chain_analysis.get('cost_breakdown', {})).decode(),
+            "procurement_strategy": cost_supply_chain_analysis.get('procurement_strategy', 'N/A'),
+            "total_duration_weeks": estimated_schedule.get('total_duration_weeks', 'N/A'),
+            "milestones": orjson.dumps(estimated_schedule.get('milestones', [])).decode(),
+            "site_considerations": site_report.get('regulatory_summary_ai', 'N/A'),
+            "architectural_style": architectural_concept.get('design_style_summary', 'N/A'),
+        })
+        # The plan quotes this project's figures, so near-duplicate prompts must not share it
+        return dict(prompt=prompt, temperature=0.4, system_instruction=_SYSTEM_INSTRUCTION, semantic_cache_namespace=None, response_schema=MasterPlan, max_output_tokens=1024)
@@ -1,31 +1,187 @@
-from abc import ABC, abstractmethod
-from google.adk.resolver import Resolver # Important for ADK components
-from typing import Dict, Any, Optional
-
-class BaseConstructionAgent(ABC):
-    """Abstract base class for all construction-related AI agents."""
-
-    def __init__(self, name: str, description: str, resolver: Resolver):
-        self.name = name
-        self.description = description
-        self.resolver = resolver # The ADK resolver instance, passed during initialization
-
-    @abstractmethod
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Abstract method to process a user request specific to the agent's domain.
-        Each specialized agent *must* implement this method.
-
-        Args:
-            user_input: A dictionary containing parsed user request details.
-                        This dictionary will contain the consolidated input from the main orchestrator.
-                        Example: {"project_description": "build a house", "location": "London", ...}
-        Returns:
-            A dictionary containing the agent's specific output.
-            This dictionary should ideally include "agent_name" and "status" ("success" or "error").
-        """
-        pass
-
-    def get_description(self) -> str:
-        """Returns the agent's description."""
-        return self.description
\ No newline at end of file
+import asyncio
+import logging
+from collections.abc import Mapping
+from google.adk.resolver import Resolver # Important for ADK components
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Any, Optional, List, Tuple, Type, Protocol
+
+from ..services.gemini_service import get_gemini_service, run_blocking
+from ..utils.common import parse_llm_model
+
+logger = logging.getLogger(__name__)
+
+class ConstructionAgent(Protocol):
+    """Structural interface the orchestrator relies on for every agent."""
+    name: str
+    input_keys: Tuple[str, ...]
+    output_keys: Tuple[str, ...]
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Processes a user request specific to the agent's domain.
+        Each specialized agent *must* implement this method.
+
+        Args:
+            user_input: A dictionary containing parsed user request details.
+                        This dictionary will contain the consolidated input from the main orchestrator.
+                        Example: {"project_description": "build a house", "location": "London", ...}
+        Returns:
+            A dictionary containing the agent's specific output.
+            This dictionary should ideally include "agent_name" and "status" ("success" or "error").
+        """
+        ...
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]: ...
+
+    def start_prefetch(self, user_input: Dict[str, Any]) -> Optional[asyncio.Task]: ...
+
+class BaseConstructionAgent:
+    """
+    Base class for all construction-related AI agents; each specialized agent implements
+    `process_request` as declared by `ConstructionAgent`.
+    Attributes are slotted, so the long-lived agent instances carry no per-instance `__dict__`;
+    subclasses declare their own `__slots__` (empty unless they add attributes).
+    """
+    __slots__ = ("name", "description", "resolver", "gemini_service")
+
+    # Concrete agent classes, keyed by the name of the module defining them, which is also
+    # the agent's registry key. Filled in by `__init_subclass__` as agent modules are imported.
+    _registry: Dict[str, type] = {}
+
+    # Dotted paths into `user_input` (e.g. "cost_supply_chain_analysis.total_estimated_cost_usd")
+    # that must be present for the agent's LLM call to be worthwhile.
+    _required_inputs: Tuple[str, ...] = ()
+
+    # Keys of the consolidated project data that the agent reads from other agents' outputs,
+    # and the keys its output adds to it. The orchestrator derives which agents can run
+    # concurrently from these.
+    input_keys: Tuple[str, ...] = ()
+    output_keys: Tuple[str, ...] = ()
+
+    # Whether `build_text_request` only reads the client's initial input, so the agent's
+    # Gemini request can be started before its upstream agents have finished.
+    prefetchable: bool = False
+
+    def __init__(self, name: str, description: str, resolver: Resolver):
+        self.name = name
+        self.description = description
+        self.resolver = resolver # The ADK resolver instance, passed during initialization
+        self.gemini_service = get_gemini_service() # Shared across all agents
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        BaseConstructionAgent._registry[cls.__module__.rsplit(".", 1)[-1]] = cls
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Asynchronous counterpart of `process_request`, with the same arguments and output.
+        By default the synchronous implementation runs on the shared Vertex AI worker pool;
+        agents with independent I/O of their own can override this with a native coroutine.
+        """
+        return await run_blocking(self.process_request, user_input)
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the agent's Gemini text request for `user_input`, as `GeminiService.generate_text`
+        keyword arguments, or None if the agent has no such request to prepare ahead of time.
+        Agents that override this send exactly this request from `aprocess_request`.
+        """
+        return None
+
+    def start_prefetch(self, user_input: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """
+        Speculatively starts the agent's Gemini request for `user_input` in the background if
+        the agent is `prefetchable`, and returns its task (None otherwise). When the agent
+        later runs, its identical request joins the in-flight call or is served from the cache.
+        """
+        if not self.prefetchable:
+            return None
+        text_request = self.build_text_request(user_input)
+        if text_request is None:
+            return None
+        return asyncio.create_task(self.gemini_service.generate_text_async(**text_request))
+
+    def replaced_agent_outputs(self, agent_output: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the outputs, keyed by agent key, of agents whose work this agent does in their
+        place, derived from its own `agent_output`, so responses keep listing those agents.
+        Most agents replace none.
+        """
+        return {}
+
+    def process_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Processes many requests for offline workloads (re-runs, evaluations), returning the
+        outputs in request order. The requests' Gemini calls, from `build_text_request`, are
+        first sent together through `GeminiService.generate_text_batch`, which fills the response
+        cache; each request is then processed as usual and served from it. A batch job can
+        take hours, so interactive callers should use `process_request`.
+        Must not be called from a running event loop.
+        """
+        text_requests = [text_request for text_request in map(self.build_text_request, requests) if text_request is not None]
+        if text_requests:
+            self.gemini_service.generate_text_batch(text_requests)
+        return [self.process_request(user_input) for user_input in requests]
+
+    async def _generate_json(self, prompt: str, temperature: float, system_instruction: str, response_schema: Type[BaseModel], fallback: Mapping[str, Any], max_output_tokens: int = 512, constrain_output: bool = True, **options: Any) -> Optional[Mapping[str, Any]]:
+        """
+        Asks Gemini for a JSON response matching `response_schema`, with `system_instruction`
+        as the static part of the prompt and at most `max_output_tokens` tokens, and returns it as a dict.
+        Returns `fallback` if the response does not match the schema, or None if Gemini
+        produced no response at all. With `constrain_output=False` the schema is only used to
+        validate the response, for models Gemini cannot express (e.g. free-form objects).
+        `options` are further `generate_text_async` arguments; near-duplicate prompts share
+        responses under the agent's name unless another `semantic_cache_namespace` (or None) is given.
+        """
+        options.setdefault("semantic_cache_namespace", self.name)
+        llm_response = await self.gemini_service.generate_text_async(
+            prompt,
+            temperature=temperature,
+            system_instruction=system_instruction,
+            response_schema=response_schema if constrain_output else None,
+            max_output_tokens=max_output_tokens,
+            **options,
+        )
+        if llm_response is None:
+            return None
+        try:
+            return parse_llm_model(llm_response, response_schema).model_dump()
+        except (ValueError, ValidationError):
+            logger.error("%s: Gemini response was not valid %s JSON: %s. Using fallback data.", self.name, response_schema.__name__, llm_response)
+            return fallback
+
+    def _missing_required_inputs(self, user_input: Dict[str, Any]) -> List[str]:
+        """
+        Returns the `_required_inputs` paths that are missing from `user_input`.
+        A value counts as missing if any step of its path is absent, or it is None or 'N/A'.
+        """
+        missing = []
+        for path in self._required_inputs:
+            value: Any = user_input
+            for key in path.split("."):
+                value = value.get(key) if isinstance(value, Mapping) else None
+                if value is None:
+                    break
+            if value is None or value == "N/A":
+                missing.append(path)
+        return missing
+
+    def _error(self, message: str) -> Dict[str, Any]:
+        """Builds the output returned when an agent fails."""
+        return {
+            "agent_name": self.name,
+            "status": "error",
+            "message": message
+        }
+
+    def _skipped_for_missing_inputs(self, missing_inputs: List[str]) -> Dict[str, Any]:
+        """Builds the output returned when an agent skips its LLM call due to missing upstream data."""
+        return {
+            "agent_name": self.name,
+            "status": "skipped",
+            "message": f"Skipped due to missing upstream data: {', '.join(missing_inputs)}."
+        }
+
+    def get_description(self) -> str:
+        """Returns the agent's description."""
+        return self.description
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from pydantic import ValidationError
+from typing import Dict, Any
+
+from .base_agent import BaseConstructionAgent
+from . import integrated_systems_engineering_agent as systems
+from . import interior_experiential_design_agent as interior
+from .schemas import CombinedDesignResponse, InteriorDesignResponse, SystemsDesignResponse
+from ..utils.common import parse_llm_json
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_INSTRUCTION = (
+    "Answer both of the following briefs for the same construction project, "
+    "putting the answer to each brief under its key."
+    f"\n\nBrief 'systems': {systems.SYSTEM_INSTRUCTION}"
+    f"\n\nBrief 'interior': {interior.SYSTEM_INSTRUCTION}"
+)
+
+class CombinedDesignAgent(BaseConstructionAgent):
+    """
+    Produces the systems engineering and interior/experiential designs with a single Gemini
+    request instead of one per agent. Both depend only on the architectural concept, so
+    they can share one prompt; the outputs have the same shapes as those of
+    IntegratedSystemsEngineeringAgent and InteriorExperientialDesignAgent,
+    which build the per-section prompts and outputs.
+    """
+    __slots__ = ("systems_agent", "interior_agent")
+    input_keys = ("project_id", "site_feasibility_report", "architectural_concept")
+    output_keys = ("system_design", "experiential_design")
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Combined Design Agent",
+            description="Develops preliminary systems and experiential designs in one request.",
+            resolver=resolver
+        )
+        self.systems_agent = systems.IntegratedSystemsEngineeringAgent(resolver=resolver)
+        self.interior_agent = interior.InteriorExperientialDesignAgent(resolver=resolver)
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Develops preliminary structural/MEP designs and interior/landscape designs.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Develops preliminary structural/MEP designs and interior/landscape designs.
+        """
+        project_id = user_input.get("project_id")
+
+        logger.info("Combined Design Agent: Starting systems and experiential design for %s.", project_id)
+
+        try:
+            prompt = (
+                f"Project details for 'systems': {self.systems_agent.build_prompt(user_input)}"
+                f"\nProject details for 'interior': {self.interior_agent.build_prompt(user_input)}"
+            )
+            llm_response = await self.gemini_service.generate_text_async(prompt, temperature=0.4, system_instruction=_SYSTEM_INSTRUCTION, response_schema=CombinedDesignResponse, max_output_tokens=1024)
+
+            if llm_response is None:
+                return self._error("LLM did not generate a valid response for combined design.")
+
+            try:
+                parsed_response = parse_llm_json(llm_response)
+            except ValueError:
+                logger.error("Combined Design Agent: Gemini response was not valid JSON: %s. Using fallback data.", llm_response)
+                parsed_response = {}
+
+            # Each section falls back on its own, so one malformed section does not discard the other
+            try:
+                systems_response = SystemsDesignResponse.model_validate(parsed_response.get("systems")).model_dump()
+            except ValidationError:
+                systems_response = systems.FALLBACK_RESPONSE
+            try:
+                interior_response = InteriorDesignResponse.model_validate(parsed_response.get("interior")).model_dump()
+            except ValidationError:
+                interior_response = interior.FALLBACK_RESPONSE
+
+            logger.info("Combined Design Agent: Completed systems and experiential design for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "system_design": self.systems_agent.build_system_design(systems_response, project_id),
+                "experiential_design": self.interior_agent.build_experiential_design(interior_response, project_id)
+            }
+
+        except (AttributeError, KeyError, TypeError, ValueError) as e: # Malformed input data; other errors reach the orchestrator
+            logger.error("Combined Design Agent: Error during combined design: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed combined design for {project_id}: {e}")
+
+    def replaced_agent_outputs(self, agent_output: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Splits `agent_output` into the outputs IntegratedSystemsEngineeringAgent and
+        InteriorExperientialDesignAgent would have returned, under their agent keys.
+        """
+        replaced = {}
+        for agent_key, agent, output_key in (
+            ("integrated_systems_engineering_agent", self.systems_agent, "system_design"),
+            ("interior_experiential_design_agent", self.interior_agent, "experiential_design"),
+        ):
+            if agent_output.get("status") == "success":
+                replaced[agent_key] = {"agent_name": agent.name, "status": "success", output_key: agent_output[output_key]}
+            else:
+                replaced[agent_key] = {**agent_output, "agent_name": agent.name}
+        return replaced
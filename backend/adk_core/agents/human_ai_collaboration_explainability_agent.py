@@ -1,94 +1,106 @@
-import logging
-import json
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-
-logger = logging.getLogger(__name__)
-
-class HumanAICollaborationExplainabilityAgent(BaseConstructionAgent):
-    """
-    Facilitates effective communication and collaboration between human stakeholders
-    and the AI agent system. It provides explanations of AI decisions,
-    interfaces for human oversight, and channels for feedback.
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Human-AI Collaboration & Explainability Agent",
-            description="Facilitates human interaction, explains AI decisions, and manages feedback.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Simulates preparing summaries and explanations for human stakeholders.
-        """
-        project_id = user_input.get("project_id")
-        master_project_plan = user_input.get("master_project_plan", {})
-        risk_safety_assessment = user_input.get("risk_safety_assessment", {})
-        qa_plan = user_input.get("quality_assurance_plan", {})
-        client_name = user_input.get("client_name", "Valued Client")
-
-        logger.info(f"Human-AI Collaboration Agent: Preparing summary for human review for project {project_id}.")
-
-        try:
-            prompt = (
-                f"As an AI system liaison, prepare a concise summary for human review "
-                f"for a construction project. Consolidate key information from the master project plan, "
-                f"risk and safety assessment, and quality assurance plan. "
-                f"Explain the key findings clearly and suggest next human actions (e.g., 'review and approve'). "
-                f"Address it to '{client_name}'. "
-                f"\n\nMaster Project Plan: {json.dumps(master_project_plan, indent=2)}"
-                f"\nRisk & Safety Assessment: {json.dumps(risk_safety_assessment, indent=2)}"
-                f"\nQuality Assurance Plan: {json.dumps(qa_plan, indent=2)}"
-                f"Output STRICTLY as a JSON object with keys 'summary_for_human' (string), "
-                f"'key_findings' (list of strings), 'recommended_human_actions' (list of strings)."
-            )
-            llm_response = self.gemini_service.generate_text(prompt, temperature=0.5)
-
-            if llm_response is None:
-                return {
-                    "agent_name": self.name,
-                    "status": "error",
-                    "message": "LLM did not generate a valid response for human collaboration summary."
-                }
-
-            try:
-                parsed_response = json.loads(llm_response)
-                if not isinstance(parsed_response, dict) or \
-                   'summary_for_human' not in parsed_response or \
-                   'key_findings' not in parsed_response or \
-                   'recommended_human_actions' not in parsed_response:
-                    raise ValueError("LLM response JSON is not in the expected human collaboration format.")
-            except json.JSONDecodeError:
-                logger.error(f"Human-AI Collaboration Agent: Gemini response was not valid JSON: {llm_response}. Using fallback data.")
-                parsed_response = {
-                    "summary_for_human": "Summary generation failed due to parsing error. Please review raw agent outputs.",
-                    "key_findings": ["Core data available in raw outputs."],
-                    "recommended_human_actions": ["Manually review all agent outputs."]
-                }
-
-            simulated_human_collaboration_output = {
-                "project_id": project_id,
-                "status": "summary_for_human_review_prepared",
-                "summary_text": parsed_response.get("summary_for_human"),
-                "key_findings": parsed_response.get("key_findings"),
-                "recommended_actions": parsed_response.get("recommended_human_actions")
-            }
-            logger.info(f"Human-AI Collaboration Agent: Prepared summary for {project_id}.")
-
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "human_collaboration_summary": simulated_human_collaboration_output
-            }
-
-        except Exception as e:
-            logger.error(f"Human-AI Collaboration Agent: Error during summary generation: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed to prepare human collaboration summary for {project_id}: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Dict, Any, Final, Mapping
+
+from .base_agent import BaseConstructionAgent
+from .schemas import HumanCollaborationSummary
+from ..utils.common import payload_json
+
+logger = logging.getLogger(__name__)
+
+# Static instructions, served from Gemini context caching so they are not re-sent per request.
+_SYSTEM_INSTRUCTION = (
+    "As an AI system liaison, prepare a concise summary for human review "
+    "for a construction project. Consolidate key information from the master project plan, "
+    "risk and safety assessment, and quality assurance plan. "
+    "Explain the key findings clearly and suggest next human actions (e.g., 'review and approve')."
+)
+
+# Used when the LLM response cannot be parsed
+_FALLBACK_RESPONSE: Final[Mapping[str, Any]] = MappingProxyType({
+    "summary_for_human": "Summary generation failed due to parsing error. Please review raw agent outputs.",
+    "key_findings": ("Core data available in raw outputs.",),
+    "recommended_human_actions": ("Manually review all agent outputs.",)
+})
+
+# Static prompt skeleton; only the placeholders are filled in per request.
+_PROMPT_TEMPLATE = (
+    "Address it to '{client_name}'. "
+    "\n\nMaster Project Plan: {master_project_plan}"
+    "\nRisk & Safety Assessment: {risk_safety_assessment}"
+    "\nQuality Assurance Plan: {qa_plan}"
+)
+
+class HumanAICollaborationExplainabilityAgent(BaseConstructionAgent):
+    """
+    Facilitates effective communication and collaboration between human stakeholders
+    and the AI agent system. It provides explanations of AI decisions,
+    interfaces for human oversight, and channels for feedback.
+    """
+    __slots__ = ()
+    input_keys = ("project_id", "master_project_plan", "quality_assurance_plan", "risk_safety_assessment")
+    output_keys = ("human_collaboration_summary",)
+    _required_inputs = ("master_project_plan.status",)
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Human-AI Collaboration & Explainability Agent",
+            description="Facilitates human interaction, explains AI decisions, and manages feedback.",
+            resolver=resolver
+        )
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Simulates preparing summaries and explanations for human stakeholders.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Simulates preparing summaries and explanations for human stakeholders.
+        """
+        project_id = user_input.get("project_id")
+
+        missing_inputs = self._missing_required_inputs(user_input)
+        if missing_inputs:
+            logger.info("Human-AI Collaboration Agent: Skipping summary for %s, missing upstream data: %s.", project_id, missing_inputs)
+            return self._skipped_for_missing_inputs(missing_inputs)
+
+        logger.info("Human-AI Collaboration Agent: Preparing summary for human review for project %s.", project_id)
+
+        try:
+            parsed_response = await self._generate_json(**self.build_text_request(user_input), fallback=_FALLBACK_RESPONSE)
+            if parsed_response is None:
+                return self._error("LLM did not generate a valid response for human collaboration summary.")
+
+            simulated_human_collaboration_output = {
+                "project_id": project_id,
+                "status": "summary_for_human_review_prepared",
+                "summary_text": parsed_response.get("summary_for_human"),
+                "key_findings": parsed_response.get("key_findings"),
+                "recommended_actions": parsed_response.get("recommended_human_actions")
+            }
+            logger.info("Human-AI Collaboration Agent: Prepared summary for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "human_collaboration_summary": simulated_human_collaboration_output
+            }
+
+        except (AttributeError, KeyError, TypeError, ValueError) as e: # Malformed input data; other errors reach the orchestrator
+            logger.error("Human-AI Collaboration Agent: Error during summary generation: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed to prepare human collaboration summary for {project_id}: {e}")
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the Gemini request summarizing the project for human review."""
+        prompt = _PROMPT_TEMPLATE.format_map({
+            "client_name": user_input.get("client_name", "Valued Client"),
+            "master_project_plan": payload_json(user_input.get("master_project_plan", {})),
+            "risk_safety_assessment": payload_json(user_input.get("risk_safety_assessment", {})),
+            "qa_plan": payload_json(user_input.get("quality_assurance_plan", {})),
+        })
+        # The summary is addressed to this client, so near-duplicate prompts must not share it
+        return dict(prompt=prompt, temperature=0.5, system_instruction=_SYSTEM_INSTRUCTION, semantic_cache_namespace=None, response_schema=HumanCollaborationSummary, max_output_tokens=1024)
@@ -1,81 +1,110 @@
-import logging
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-
-logger = logging.getLogger(__name__)
-
-class HyperRealistic3DDigitalTwinAgent(BaseConstructionAgent):
-    """
-    Creates a comprehensive 3D digital twin of the project by integrating all design aspects
-    (architectural, structural, MEP, interior, landscape). It generates photorealistic
-    renders (using Imagen).
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Hyper-Realistic 3D Digital Twin Agent",
-            description="Integrates all design aspects into a comprehensive 3D model and generates renders.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Creates an initial 3D digital twin and generates renders.
-        """
-        project_id = user_input.get("project_id")
-        architectural_concept = user_input.get("architectural_concept", {})
-        experiential_design = user_input.get("experiential_design", {})
-        site_report = user_input.get("site_feasibility_report", {}) # Get site report for context
-
-        logger.info(f"Digital Twin Agent: Creating digital twin and renders for {project_id}.")
-
-        try:
-            # Generate exterior render using Imagen
-            exterior_render_prompt = (
-                f"Photorealistic 3D exterior render of a {architectural_concept.get('design_style_summary')} "
-                f"building at {site_report.get('location')} with a '{experiential_design.get('landscape_features')}' landscape. "
-                f"Incorporate elements from features like {', '.join(architectural_concept.get('key_design_elements', []))}. High detail, natural lighting, daytime."
-            )
-            logger.info("Digital Twin Agent: Generating exterior render using Imagen...")
-            exterior_render_base64 = self.gemini_service.generate_image(exterior_render_prompt)
-
-            # Generate interior render using Imagen
-            interior_render_prompt = (
-                f"Photorealistic 3D interior render of a {architectural_concept.get('design_style_summary')} building, "
-                f"with '{experiential_design.get('interior_style')}' decor and materials like '{experiential_design.get('material_palette_notes')}'. "
-                f"Warm lighting, cozy atmosphere, focus on a living area."
-            )
-            logger.info("Digital Twin Agent: Generating interior render using Imagen...")
-            interior_render_base64 = self.gemini_service.generate_image(interior_render_prompt)
-
-            simulated_twin_output = {
-                "project_id": project_id,
-                "digital_twin_url_placeholder": "[https://example.com/digital_twin_model.gltf](https://example.com/digital_twin_model.gltf)", # Placeholder for actual 3D model file path
-                "exterior_render_base64": exterior_render_base64[:100] + "..." if exterior_render_base64 else "N/A", # Truncate for display
-                "full_exterior_render_base64": exterior_render_base64, # Full base64 for actual display
-                "interior_render_base64": interior_render_base64[:100] + "..." if interior_render_base64 else "N/A", # Truncate for display
-                "full_interior_render_base64": interior_render_base64, # Full base64 for actual display
-                "status": "initial_twin_created",
-                "details": "High-fidelity digital twin model and initial renders generated.",
-                "generated_render_prompts": {
-                    "exterior": exterior_render_prompt,
-                    "interior": interior_render_prompt
-                }
-            }
-            logger.info(f"Digital Twin Agent: Completed digital twin creation and renders for {project_id}.")
-
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "digital_twin_output": simulated_twin_output
-            }
-
-        except Exception as e:
-            logger.error(f"Digital Twin Agent: Error generating digital twin or renders: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed digital twin creation for {project_id}: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+
+from .base_agent import BaseConstructionAgent
+from ...config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class HyperRealistic3DDigitalTwinAgent(BaseConstructionAgent):
+    """
+    Creates a comprehensive 3D digital twin of the project by integrating all design aspects
+    (architectural, structural, MEP, interior, landscape). It generates photorealistic
+    renders (using Imagen).
+    """
+    __slots__ = ()
+    input_keys = ("project_id", "site_feasibility_report", "architectural_concept", "experiential_design")
+    output_keys = ("digital_twin_output",)
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Hyper-Realistic 3D Digital Twin Agent",
+            description="Integrates all design aspects into a comprehensive 3D model and generates renders.",
+            resolver=resolver
+        )
+
+    async def _generate_renders(self, prompts: List[str]) -> List[Optional[str]]:
+        """
+        Generates one render per prompt and returns their Cloud Storage URIs when a renders
+        bucket is configured, otherwise their base64 encodings (requested in a single Imagen
+        call). Entries are None where generation failed.
+        """
+        if settings.RENDERS_BUCKET:
+            stored_renders = await asyncio.gather(
+                *(self.gemini_service.generate_image_to_storage_async(prompt) for prompt in prompts)
+            )
+            return [stored_render[0] if stored_render else None for stored_render in stored_renders]
+        return await self.gemini_service.generate_images_batch_async(prompts)
+
+    def _render_fields(self, view: str, render: Optional[str]) -> Dict[str, Any]:
+        """
+        Returns the output fields holding a render: its Cloud Storage URI and a signed URL
+        the frontend can load when a renders bucket is configured, otherwise its base64.
+        """
+        if settings.RENDERS_BUCKET:
+            return {
+                f"{view}_render_uri": render or "N/A",
+                f"{view}_render_url": (self.gemini_service.signed_render_url(render) if render else None) or "N/A",
+            }
+        return {f"full_{view}_render_base64": render} # Full base64 for actual display
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Creates an initial 3D digital twin and generates renders.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Creates an initial 3D digital twin and generates the exterior and interior
+        renders together.
+        """
+        project_id = user_input.get("project_id")
+        architectural_concept = user_input.get("architectural_concept", {})
+        experiential_design = user_input.get("experiential_design", {})
+        site_report = user_input.get("site_feasibility_report", {}) # Get site report for context
+
+        logger.info("Digital Twin Agent: Creating digital twin and renders for %s.", project_id)
+
+        try:
+            exterior_render_prompt = (
+                f"Photorealistic 3D exterior render of a {architectural_concept.get('design_style_summary')} "
+                f"building at {site_report.get('location')} with a '{experiential_design.get('landscape_features')}' landscape. "
+                f"Incorporate elements from features like {', '.join(architectural_concept.get('key_design_elements', []))}. High detail, natural lighting, daytime."
+            )
+            interior_render_prompt = (
+                f"Photorealistic 3D interior render of a {architectural_concept.get('design_style_summary')} building, "
+                f"with '{experiential_design.get('interior_style')}' decor and materials like '{experiential_design.get('material_palette_notes')}'. "
+                f"Warm lighting, cozy atmosphere, focus on a living area."
+            )
+            # Generate exterior and interior renders together using Imagen
+            logger.info("Digital Twin Agent: Generating exterior and interior renders using Imagen...")
+            exterior_render, interior_render = await self._generate_renders(
+                [exterior_render_prompt, interior_render_prompt]
+            )
+
+            simulated_twin_output = {
+                "project_id": project_id,
+                "digital_twin_url_placeholder": "[https://example.com/digital_twin_model.gltf](https://example.com/digital_twin_model.gltf)", # Placeholder for actual 3D model file path
+                **self._render_fields("exterior", exterior_render),
+                **self._render_fields("interior", interior_render),
+                "status": "initial_twin_created",
+                "details": "High-fidelity digital twin model and initial renders generated.",
+                "generated_render_prompts": {
+                    "exterior": exterior_render_prompt,
+                    "interior": interior_render_prompt
+                }
+            }
+            logger.info("Digital Twin Agent: Completed digital twin creation and renders for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "digital_twin_output": simulated_twin_output
+            }
+
+        except Exception as e:
+            logger.error("Digital Twin Agent: Error generating digital twin or renders: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed digital twin creation for {project_id}: {e}")
@@ -1,91 +1,98 @@
-import logging
-import json
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-
-logger = logging.getLogger(__name__)
-
-class ProactiveRiskSafetyManagementAgent(BaseConstructionAgent):
-    """
-    Identifies, assesses, and mitigates project risks (e.g., financial, schedule, technical)
-    and ensures safety compliance throughout the construction lifecycle.
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Proactive Risk & Safety Management Agent",
-            description="Identifies, assesses, and mitigates project risks and ensures safety compliance.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Assesses risks and safety concerns for the project.
-        """
-        project_id = user_input.get("project_id")
-        master_project_plan = user_input.get("master_project_plan", {})
-        site_report = user_input.get("site_feasibility_report", {})
-        project_description = user_input.get("project_description", "a construction project")
-
-        logger.info(f"Risk/Safety Agent: Assessing risks and safety for project {project_id}.")
-
-        try:
-            prompt = (
-                f"As a construction risk and safety manager, analyze the following project details "
-                f"and identify potential risks (financial, schedule, technical, safety). "
-                f"Suggest mitigation strategies for these risks. "
-                f"\nProject Description: {project_description}"
-                f"\nMaster Plan Summary: {master_project_plan.get('budget_summary')}, {master_project_plan.get('timeline_summary')}, Milestones: {master_project_plan.get('key_milestones_overview')}"
-                f"\nSite Report Environmental Risk: {site_report.get('environmental_risk')}"
-                f"\nSite Compliance Challenges: {', '.join(site_report.get('compliance_challenges_ai', []))}"
-                f"Output STRICTLY as a JSON object with keys 'identified_risks' (list of strings with description and type), "
-                f"'mitigation_strategies' (list of strings), 'safety_highlights' (list of strings)."
-            )
-            llm_response = self.gemini_service.generate_text(prompt, temperature=0.5)
-
-            if llm_response is None:
-                return {
-                    "agent_name": self.name,
-                    "status": "error",
-                    "message": "LLM did not generate a valid response for risk/safety."
-                }
-
-            try:
-                parsed_response = json.loads(llm_response)
-                if not isinstance(parsed_response, dict) or \
-                   'identified_risks' not in parsed_response or \
-                   'mitigation_strategies' not in parsed_response or \
-                   'safety_highlights' not in parsed_response:
-                    raise ValueError("LLM response JSON is not in the expected risk/safety format.")
-            except json.JSONDecodeError:
-                logger.error(f"Risk/Safety Agent: Gemini response was not valid JSON: {llm_response}. Using fallback data.")
-                parsed_response = {
-                    "identified_risks": ["Generic risk identified due to parsing error."],
-                    "mitigation_strategies": ["Generic mitigation strategy."],
-                    "safety_highlights": ["General safety practices applicable."]
-                }
-
-            simulated_risk_safety = {
-                "project_id": project_id,
-                "status": "risk_safety_assessment_complete",
-                "risks": parsed_response.get("identified_risks"),
-                "mitigation_strategies": parsed_response.get("mitigation_strategies"),
-                "safety_highlights": parsed_response.get("safety_highlights")
-            }
-            logger.info(f"Risk/Safety Agent: Completed risk and safety assessment for {project_id}.")
-
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "risk_safety_assessment": simulated_risk_safety
-            }
-
-        except Exception as e:
-            logger.error(f"Risk/Safety Agent: Error during risk/safety assessment: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed risk/safety assessment for {project_id}: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Dict, Any, Final, Mapping
+
+from .base_agent import BaseConstructionAgent
+from .schemas import RiskSafetyResponse
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_INSTRUCTION = (
+    "As a construction risk and safety manager, analyze the project details given "
+    "and identify potential risks (financial, schedule, technical, safety). "
+    "Suggest mitigation strategies for these risks, and describe each risk along with its type."
+)
+
+# Used when the LLM response cannot be parsed
+_FALLBACK_RESPONSE: Final[Mapping[str, Any]] = MappingProxyType({
+    "identified_risks": ("Generic risk identified due to parsing error.",),
+    "mitigation_strategies": ("Generic mitigation strategy.",),
+    "safety_highlights": ("General safety practices applicable.",)
+})
+
+_PROMPT_TEMPLATE = (
+    "Project Description: {project_description}"
+    "\nMaster Plan Summary: {budget_summary}, {timeline_summary}, Milestones: {key_milestones_overview}"
+    "\nSite Report Environmental Risk: {environmental_risk}"
+    "\nSite Compliance Challenges: {compliance_challenges}"
+)
+
+class ProactiveRiskSafetyManagementAgent(BaseConstructionAgent):
+    """
+    Identifies, assesses, and mitigates project risks (e.g., financial, schedule, technical)
+    and ensures safety compliance throughout the construction lifecycle.
+    """
+    __slots__ = ()
+    input_keys = ("project_id", "site_feasibility_report", "master_project_plan")
+    output_keys = ("risk_safety_assessment",)
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Proactive Risk & Safety Management Agent",
+            description="Identifies, assesses, and mitigates project risks and ensures safety compliance.",
+            resolver=resolver
+        )
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Assesses risks and safety concerns for the project.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Assesses risks and safety concerns for the project.
+        """
+        project_id = user_input.get("project_id")
+
+        logger.info("Risk/Safety Agent: Assessing risks and safety for project %s.", project_id)
+
+        try:
+            parsed_response = await self._generate_json(**self.build_text_request(user_input), fallback=_FALLBACK_RESPONSE)
+            if parsed_response is None:
+                return self._error("LLM did not generate a valid response for risk/safety.")
+
+            simulated_risk_safety = {
+                "project_id": project_id,
+                "status": "risk_safety_assessment_complete",
+                "risks": parsed_response.get("identified_risks"),
+                "mitigation_strategies": parsed_response.get("mitigation_strategies"),
+                "safety_highlights": parsed_response.get("safety_highlights")
+            }
+            logger.info("Risk/Safety Agent: Completed risk and safety assessment for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "risk_safety_assessment": simulated_risk_safety
+            }
+
+        except (AttributeError, KeyError, TypeError, ValueError) as e: # Malformed input data; other errors reach the orchestrator
+            logger.error("Risk/Safety Agent: Error during risk/safety assessment: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed risk/safety assessment for {project_id}: {e}")
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the Gemini request assessing the project's risks and safety."""
+        master_project_plan = user_input.get("master_project_plan", {})
+        site_report = user_input.get("site_feasibility_report", {})
+        prompt = _PROMPT_TEMPLATE.format_map({
+            "project_description": user_input.get("project_description", "a construction project"),
+            "budget_summary": master_project_plan.get('budget_summary'),
+            "timeline_summary": master_project_plan.get('timeline_summary'),
+            "key_milestones_overview": master_project_plan.get('key_milestones_overview'),
+            "environmental_risk": site_report.get('environmental_risk'),
+            "compliance_challenges": ', '.join(site_report.get('compliance_challenges_ai', [])),
+        })
+        return dict(prompt=prompt, temperature=0.1, system_instruction=_SYSTEM_INSTRUCTION, semantic_cache_namespace=self.name, response_schema=RiskSafetyResponse, max_output_tokens=512)
@@ -0,0 +1,120 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Dict, List, Optional
+
+# Pydantic models describing the JSON that agents request from Gemini.
+# Passed as `response_schema`, they constrain Gemini's output to that shape.
+# Agents validate responses with `parse_llm_model`, which parses and checks the
+# response in one pass; any malformed or incomplete response raises ValidationError.
+
+class _ResponseModel(BaseModel):
+    """Base of the response models: immutable, and keys the schema does not define are dropped."""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+class MasterPlan(_ResponseModel):
+    """Master project plan drafted by the Adaptive Project Management agent."""
+    status: str
+    budget_summary: str
+    timeline_summary: str
+    key_milestones_overview: str
+    risks_identified: List[str] = []
+    next_steps: List[str] = []
+
+class HumanCollaborationSummary(_ResponseModel):
+    """Summary for human review prepared by the Human-AI Collaboration agent."""
+    summary_for_human: str
+    key_findings: List[str]
+    recommended_human_actions: List[str]
+
+class SystemsDesignResponse(_ResponseModel):
+    """Structural and MEP notes from the Integrated Systems Engineering agent."""
+    structural_notes: str
+    mep_notes: str
+    integration_challenges: List[str]
+
+class InteriorDesignResponse(_ResponseModel):
+    """Interior and landscape proposal from the Interior Experiential Design agent."""
+    interior_style: str
+    landscape_features: str
+    material_palette_notes: str
+
+class CombinedDesignResponse(_ResponseModel):
+    """Both design briefs answered in one response by the Combined Design agent."""
+    systems: SystemsDesignResponse
+    interior: InteriorDesignResponse
+
+class LearningAdaptationResponse(_ResponseModel):
+    """Lessons learned from the Learning & Adaptation agent."""
+    lessons_learned: List[str]
+    adaptation_suggestions: List[str]
+
+class LegalContractResponse(_ResponseModel):
+    """Legal and contractual considerations from the Legal & Contract Management agent."""
+    legal_overview: str
+    common_contract_types: List[str]
+    key_contract_clauses: List[str]
+    required_permits_licenses: List[str]
+
+class FacilityManagementResponse(_ResponseModel):
+    """Facility management outline from the Post-Construction & Facility Management agent."""
+    fm_overview: str
+    maintenance_requirements: List[str]
+    operational_challenges: List[str]
+    smart_building_tech_suggestions: List[str]
+
+class CostBreakdown(_ResponseModel):
+    """Estimated cost per category, in USD."""
+    materials: float
+    labor: float
+    equipment: float
+    permits_fees: float
+    contingency: float
+
+class CostSupplyChainResponse(_ResponseModel):
+    """Cost estimate and procurement strategy from the Predictive Cost & Supply Chain agent."""
+    total_estimated_cost_usd: float
+    cost_breakdown: CostBreakdown
+    procurement_strategy: str
+
+class RiskSafetyResponse(_ResponseModel):
+    """Risk and safety assessment from the Proactive Risk & Safety Management agent."""
+    identified_risks: List[str]
+    mitigation_strategies: List[str]
+    safety_highlights: List[str]
+
+class PRStrategyResponse(_ResponseModel):
+    """Communication strategy from the Public Relations & Stakeholder Communication agent."""
+    communication_overview: str
+    key_stakeholders: List[str]
+    communication_channels: List[str]
+    key_messages: List[str]
+
+class DataIntegrationResponse(_ResponseModel):
+    """Data integration analysis from the Semantic Data Integration & Ontology agent."""
+    data_domains: List[str]
+    integration_challenges: List[str]
+    suggested_ontologies: List[str]
+
+class RegulatoryInterpretationResponse(_ResponseModel):
+    """Regulatory interpretation of the site from the Site Intelligence & Regulatory Compliance agent."""
+    summary: str = "N/A"
+    compliance_challenges: List[str] = []
+    recommendations: List[str] = []
+
+class ClientRequirementsResponse(_ResponseModel):
+    """Refined client requirements from the Strategic Client Engagement agent."""
+    parsed_requirements: Optional[Dict[str, Any]] = None # The raw inquiry is used when missing
+    # The LLM may return these as plain strings or as lists.
+    clarification_needed: Any = "None"
+    suggested_next_steps: Any = "Proceed to site analysis."
+
+class SustainabilityResponse(_ResponseModel):
+    """Green building assessment from the Sustainability & Green Building agent."""
+    sustainability_potential: str
+    green_strategies: List[str]
+    potential_certifications: List[str]
+
+class WorkforceHRResponse(_ResponseModel):
+    """Workforce and HR outline from the Workforce Management & HR agent."""
+    workforce_needs: List[str]
+    hr_considerations: List[str]
+    labor_compliance_highlights: List[str]
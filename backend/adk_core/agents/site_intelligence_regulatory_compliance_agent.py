@@ -1,131 +1,179 @@
-import json
-import logging
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-from ..utils.common import format_output_json
-
-logger = logging.getLogger(__name__)
-
-class SiteIntelligenceRegulatoryComplianceAgent(BaseConstructionAgent):
-    """
-    Analyzes site data and regulatory constraints for a construction project.
-    It simulates data retrieval (e.g., zoning, environmental risks) and uses Gemini
-    to interpret common building codes and assess potential compliance challenges.
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Site Intelligence & Regulatory Compliance Agent",
-            description="Analyzes site feasibility, zoning, and regulatory compliance.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-        # Mock data for site analysis and regulations. In a real application,
-        # this would involve calling external APIs (e.g., geospatial services,
-        # local government databases for zoning and building codes).
-        self.mock_zoning_data = {
-            "London, UK": {
-                "residential": {"allowed_height_m": 12, "setbacks_m": {"front": 5, "sides": 3, "rear": 7}},
-                "commercial": {"allowed_height_m": 20, "setbacks_m": {"front": 3, "sides": 1, "rear": 5}},
-                "max_coverage_percent": 40,
-                "environmental_risk": "Low (potential for minor soil contamination near old industrial sites)",
-                "common_building_codes": "UK Building Regulations Part B (Fire Safety), Part M (Access to and use of buildings), Part L (Conservation of fuel and power)."
-            },
-            "New York, USA": {
-                "residential": {"allowed_height_m": 150, "setbacks_m": {"front": 0, "sides": 0, "rear": 0}},
-                "commercial": {"allowed_height_m": 300, "setbacks_m": {"front": 0, "sides": 0, "rear": 0}},
-                "max_coverage_percent": 100,
-                "environmental_risk": "Medium (urban heat island effect, historical underground infrastructure)",
-                "common_building_codes": "NYC Building Code, ADA Compliance."
-            },
-            "Rural, California, USA": {
-                "residential": {"allowed_height_m": 10, "setbacks_m": {"front": 10, "sides": 5, "rear": 10}},
-                "commercial": {"allowed_height_m": 15, "setbacks_m": {"front": 8, "sides": 4, "rear": 8}},
-                "max_coverage_percent": 25,
-                "environmental_risk": "High (wildfire risk, seismic activity, water scarcity, protected species habitats)",
-                "common_building_codes": "California Building Standards Code (Title 24), Wildland-Urban Interface (WUI) codes."
-            }
-        }
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Performs site analysis and regulatory compliance checks.
-        """
-        project_id = user_input.get("project_id") # Passed from Client Engagement Agent
-        location = user_input.get("location")
-        project_type = user_input.get("project_type")
-        initial_requirements = user_input.get("parsed_data", user_input) # Get refined requirements
-
-        logger.info(f"Site Intelligence Agent: Starting site analysis for project {project_id} at {location} for a {project_type} building.")
-
-        try:
-            # 1. Simulate Site Data Retrieval (replace with real API calls in production)
-            # Selects mock data based on location, defaults if not found.
-            site_info = self.mock_zoning_data.get(location, self.mock_zoning_data["London, UK"])
-            
-            zoning_rules = site_info.get(project_type, {})
-            environmental_risk = site_info.get("environmental_risk", "Unknown")
-            common_codes = site_info.get("common_building_codes", "Standard building codes apply.")
-
-            # 2. Use Gemini for Regulatory Interpretation and Risk Assessment Summary
-            regulatory_prompt = (
-                f"Given the following site information and common building codes for a '{location}' located project "
-                f"of type '{project_type}', summarize the key regulatory constraints and primary environmental risks. "
-                f"Focus on aspects like maximum height, setbacks, and notable code sections. "
-                f"Also, identify any potential compliance challenges given the initial requirements: {json.dumps(initial_requirements)}. "
-                f"Site Info: {json.dumps(site_info)}"
-                f"Format the output STRICTLY as a JSON object with keys like 'summary', 'compliance_challenges' (list of strings), 'recommendations' (list of strings)."
-            )
-            logger.info("Site Intelligence Agent: Calling Gemini for regulatory interpretation...")
-            gemini_regulatory_response_str = self.gemini_service.generate_text(regulatory_prompt, temperature=0.2)
-
-            if gemini_regulatory_response_str is None:
-                return {
-                    "agent_name": self.name,
-                    "status": "error",
-                    "message": "LLM did not generate a valid response for regulatory interpretation."
-                }
-
-            try:
-                gemini_regulatory_parsed = json.loads(gemini_regulatory_response_str)
-            except json.JSONDecodeError:
-                logger.error(f"Site Intelligence Agent: Gemini regulatory response was not valid JSON: {gemini_regulatory_response_str}. Using fallback data.")
-                gemini_regulatory_parsed = {
-                    "summary": "Could not parse regulatory summary from AI. Manual review required.",
-                    "compliance_challenges": ["AI parsing failed or response malformed."],
-                    "recommendations": ["Consult local regulations directly for detailed compliance."]
-                }
-
-            # 3. Compile the comprehensive Site Feasibility Report
-            site_feasibility_report = {
-                "project_id": project_id,
-                "location": location,
-                "project_type": project_type,
-                "status": "initial_analysis_complete",
-                "zoning_data": {
-                    "allowed_height_m": zoning_rules.get("allowed_height_m", "N/A"),
-                    "setbacks_m": zoning_rules.get("setbacks_m", {}),
-                    "max_coverage_percent": site_info.get("max_coverage_percent", "N/A")
-                },
-                "environmental_risk": environmental_risk,
-                "common_building_codes": common_codes,
-                "regulatory_summary_ai": gemini_regulatory_parsed.get("summary", "N/A"),
-                "compliance_challenges_ai": gemini_regulatory_parsed.get("compliance_challenges", []),
-                "site_recommendations_ai": gemini_regulatory_parsed.get("recommendations", [])
-            }
-            logger.info(f"Site Intelligence Agent: Generated Site Feasibility Report for {project_id}.")
-
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "site_feasibility_report": site_feasibility_report
-            }
-
-        except Exception as e:
-            logger.error(f"Site Intelligence Agent: Error during site analysis: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed site analysis for {project_id}: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import functools
+import logging
+from types import MappingProxyType
+from typing import Dict, Any, Final, Mapping, NamedTuple, Optional
+
+from .base_agent import BaseConstructionAgent
+from .schemas import RegulatoryInterpretationResponse
+from ..utils.common import bucket_amounts, payload_json, template_id, template_key
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_INSTRUCTION = (
+    "Given the site information and common building codes for a construction project, "
+    "summarize the key regulatory constraints and primary environmental risks. "
+    "Focus on aspects like maximum height, setbacks, and notable code sections. "
+    "Also, identify any potential compliance challenges given the initial requirements."
+)
+
+# Used when the LLM response cannot be parsed
+_FALLBACK_RESPONSE: Final[Mapping[str, Any]] = MappingProxyType({
+    "summary": "Could not parse regulatory summary from AI. Manual review required.",
+    "compliance_challenges": ("AI parsing failed or response malformed.",),
+    "recommendations": ("Consult local regulations directly for detailed compliance.",)
+})
+
+_PROMPT_TEMPLATE = (
+    "Location: '{location}'. Project type: '{project_type}'. "
+    "Initial requirements: {initial_requirements}. Site Info: {site_info}"
+)
+
+# Versioned by the instruction and template text, so editing either invalidates cached responses
+_TEMPLATE_ID: Final[str] = template_id("site_regulatory", _SYSTEM_INSTRUCTION, _PROMPT_TEMPLATE)
+
+# Requirement fields identifying the client rather than the project
+_CLIENT_IDENTITY_KEYS: Final[frozenset] = frozenset({"client_name", "project_id"})
+
+# Mock data for site analysis and regulations. In a real application,
+# this would involve calling external APIs (e.g., geospatial services,
+# local government databases for zoning and building codes).
+_MOCK_ZONING_DATA: Final[Mapping[str, Mapping[str, Any]]] = MappingProxyType({
+    "London, UK": {
+        "residential": {"allowed_height_m": 12, "setbacks_m": {"front": 5, "sides": 3, "rear": 7}},
+        "commercial": {"allowed_height_m": 20, "setbacks_m": {"front": 3, "sides": 1, "rear": 5}},
+        "max_coverage_percent": 40,
+        "environmental_risk": "Low (potential for minor soil contamination near old industrial sites)",
+        "common_building_codes": "UK Building Regulations Part B (Fire Safety), Part M (Access to and use of buildings), Part L (Conservation of fuel and power)."
+    },
+    "New York, USA": {
+        "residential": {"allowed_height_m": 150, "setbacks_m": {"front": 0, "sides": 0, "rear": 0}},
+        "commercial": {"allowed_height_m": 300, "setbacks_m": {"front": 0, "sides": 0, "rear": 0}},
+        "max_coverage_percent": 100,
+        "environmental_risk": "Medium (urban heat island effect, historical underground infrastructure)",
+        "common_building_codes": "NYC Building Code, ADA Compliance."
+    },
+    "Rural, California, USA": {
+        "residential": {"allowed_height_m": 10, "setbacks_m": {"front": 10, "sides": 5, "rear": 10}},
+        "commercial": {"allowed_height_m": 15, "setbacks_m": {"front": 8, "sides": 4, "rear": 8}},
+        "max_coverage_percent": 25,
+        "environmental_risk": "High (wildfire risk, seismic activity, water scarcity, protected species habitats)",
+        "common_building_codes": "California Building Standards Code (Title 24), Wildland-Urban Interface (WUI) codes."
+    }
+})
+
+class _SiteInfo(NamedTuple):
+    """Site data resolved for a (location, project type) pair."""
+    allowed_height_m: Any
+    setbacks_m: Mapping[str, Any]
+    max_coverage_percent: Any
+    environmental_risk: str
+    common_building_codes: str
+    site_info_json: str # The location's data as compact JSON, for the prompt
+
+@functools.lru_cache(maxsize=256)
+def _resolve_site(location: Optional[str], project_type: Optional[str]) -> _SiteInfo:
+    """Looks up the mock site data for a location, defaulting to London, UK if it is unknown."""
+    site_info = _MOCK_ZONING_DATA.get(location, _MOCK_ZONING_DATA["London, UK"])
+    zoning_rules = site_info.get(project_type, {})
+    return _SiteInfo(
+        allowed_height_m=zoning_rules.get("allowed_height_m", "N/A"),
+        setbacks_m=MappingProxyType(zoning_rules.get("setbacks_m", {})),
+        max_coverage_percent=site_info.get("max_coverage_percent", "N/A"),
+        environmental_risk=site_info.get("environmental_risk", "Unknown"),
+        common_building_codes=site_info.get("common_building_codes", "Standard building codes apply."),
+        site_info_json=payload_json(site_info),
+    )
+
+class SiteIntelligenceRegulatoryComplianceAgent(BaseConstructionAgent):
+    """
+    Analyzes site data and regulatory constraints for a construction project.
+    It simulates data retrieval (e.g., zoning, environmental risks) and uses Gemini
+    to interpret common building codes and assess potential compliance challenges.
+    """
+    __slots__ = ()
+    input_keys = ("project_id", "parsed_data")
+    output_keys = ("site_feasibility_report",)
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Site Intelligence & Regulatory Compliance Agent",
+            description="Analyzes site feasibility, zoning, and regulatory compliance.",
+            resolver=resolver
+        )
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Performs site analysis and regulatory compliance checks.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Performs site analysis and regulatory compliance checks.
+        """
+        project_id = user_input.get("project_id") # Passed from Client Engagement Agent
+        location = user_input.get("location")
+        project_type = user_input.get("project_type")
+
+        logger.info("Site Intelligence Agent: Starting site analysis for project %s at %s for a %s building.", project_id, location, project_type)
+
+        try:
+            # 1. Simulate Site Data Retrieval (replace with real API calls in production)
+            site = _resolve_site(location, project_type)
+
+            # 2. Use Gemini for Regulatory Interpretation and Risk Assessment Summary
+            logger.info("Site Intelligence Agent: Calling Gemini for regulatory interpretation...")
+            gemini_regulatory_parsed = await self._generate_json(**self.build_text_request(user_input), fallback=_FALLBACK_RESPONSE)
+            if gemini_regulatory_parsed is None:
+                return self._error("LLM did not generate a valid response for regulatory interpretation.")
+
+            # 3. Compile the comprehensive Site Feasibility Report
+            site_feasibility_report = {
+                "project_id": project_id,
+                "location": location,
+                "project_type": project_type,
+                "status": "initial_analysis_complete",
+                "zoning_data": {
+                    "allowed_height_m": site.allowed_height_m,
+                    "setbacks_m": dict(site.setbacks_m),
+                    "max_coverage_percent": site.max_coverage_percent
+                },
+                "environmental_risk": site.environmental_risk,
+                "common_building_codes": site.common_building_codes,
+                "regulatory_summary_ai": gemini_regulatory_parsed.get("summary", "N/A"),
+                "compliance_challenges_ai": gemini_regulatory_parsed.get("compliance_challenges", []),
+                "site_recommendations_ai": gemini_regulatory_parsed.get("recommendations", [])
+            }
+            logger.info("Site Intelligence Agent: Generated Site Feasibility Report for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "site_feasibility_report": site_feasibility_report
+            }
+
+        except (AttributeError, KeyError, TypeError, ValueError) as e: # Malformed input data; other errors reach the orchestrator
+            logger.error("Site Intelligence Agent: Error during site analysis: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed site analysis for {project_id}: {e}")
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the Gemini request interpreting the regulations that apply to the site."""
+        location = user_input.get("location")
+        project_type = user_input.get("project_type")
+        slots = {
+            "location": location,
+            "project_type": project_type,
+            # Refined requirements, without who the client is and with budgets rounded to the
+            # nearest $100k: the regulatory picture depends on neither, so nearby projects share
+            # an interpretation
+            "initial_requirements": {key: bucket_amounts(value) if "budget" in key.lower() else value
+                                     for key, value in user_input.get("parsed_data", user_input).items()
+                                     if key not in _CLIENT_IDENTITY_KEYS},
+            "site_info": _resolve_site(location, project_type).site_info_json,
+        }
+        # The prompt is rendered from exactly the slots it is keyed on, so a cached
+        # interpretation always answers the prompt that would have been sent
+        regulatory_prompt = _PROMPT_TEMPLATE.format_map({**slots, "initial_requirements": payload_json(slots["initial_requirements"])})
+        return dict(prompt=regulatory_prompt, temperature=0.2, system_instruction=_SYSTEM_INSTRUCTION, semantic_cache_namespace=self.name, response_schema=RegulatoryInterpretationResponse, max_output_tokens=1024, template_key=template_key(_TEMPLATE_ID, slots))
@@ -1,92 +1,101 @@
-import json
-import logging
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-from ..utils.common import format_output_json
-
-logger = logging.getLogger(__name__)
-
-class StrategicClientEngagementAgent(BaseConstructionAgent):
-    """
-    The initial entry point agent. It processes raw client inquiries,
-    refines requirements, and provides an initial acknowledgment.
-    It can also act as an aggregator for high-level results or
-    pass the consolidated client data to the next agent in a workflow.
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Strategic Client Engagement Agent",
-            description="Manages initial client interaction, requirement gathering, and project initiation.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-        # Mock data for demonstration purposes. In a real system, this would be dynamic.
-        self.mock_project_id = "proj_" + str(hash("initial_project_data"))[:8] # Simple, unique ID
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Processes initial client inquiry to refine requirements and kick off the workflow.
-        """
-        client_data = user_input # User input is already structured by main.py's Pydantic model
-
-        logger.info(f"Client Engagement Agent: Processing new client inquiry for {client_data.get('client_name')}")
-
-        try:
-            # Use Gemini to parse and refine requirements
-            prompt = (
-                f"Analyze the following client inquiry for a construction project and extract key, "
-                f"structured requirements. Be precise about 'project_type', 'client_name', 'budget_range', "
-                f"'location', and 'desired_features'. Identify any ambiguities or areas requiring clarification. "
-                f"Also, suggest immediate next steps for the project lifecycle. \n\n"
-                f"Client Inquiry: {json.dumps(client_data, indent=2)}"
-                f"Format the output STRICTLY as a JSON object with keys like 'parsed_requirements', 'clarification_needed', 'suggested_next_steps'."
-            )
-            logger.info("Client Engagement Agent: Calling Gemini to parse requirements...")
-            gemini_response_str = self.gemini_service.generate_text(prompt, temperature=0.2)
-
-            if gemini_response_str is None:
-                 return {
-                    "agent_name": self.name,
-                    "status": "error",
-                    "message": "LLM did not generate a valid response for requirement parsing."
-                 }
-
-            try:
-                gemini_parsed_response = json.loads(gemini_response_str)
-            except json.JSONDecodeError:
-                logger.error(f"Client Engagement Agent: Gemini response was not valid JSON: {gemini_response_str}. Using raw data as fallback.")
-                gemini_parsed_response = {
-                    "parsed_requirements": client_data,
-                    "clarification_needed": "Gemini could not parse inquiry, manual review needed.",
-                    "suggested_next_steps": "Manual review of client inquiry."
-                }
-
-            parsed_requirements = gemini_parsed_response.get("parsed_requirements", client_data)
-            clarification_needed = gemini_parsed_response.get("clarification_needed", "None")
-            suggested_next_steps = gemini_parsed_response.get("suggested_next_steps", "Proceed to site analysis.")
-
-            logger.info(f"Client Engagement Agent: Parsed Requirements: {format_output_json(parsed_requirements)}")
-            logger.info(f"Client Engagement Agent: Clarification Needed: {clarification_needed}")
-            logger.info(f"Client Engagement Agent: Suggested Next Steps: {suggested_next_steps}")
-
-            # Return the processed client data. In a real ADK workflow, this agent might
-            # also send messages to other agents via the resolver.
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "details": "Client inquiry processed. Initial data extracted. Workflow initiated.",
-                "parsed_data": parsed_requirements,
-                "clarifications": clarification_needed,
-                "workflow_suggested": suggested_next_steps,
-                "project_id": self.mock_project_id # Pass a consistent project ID
-            }
-
-        except Exception as e:
-            logger.error(f"Client Engagement Agent: Error processing inquiry: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed to process client inquiry: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Dict, Any, Final, Mapping
+
+from .base_agent import BaseConstructionAgent
+from .schemas import ClientRequirementsResponse
+from ..utils.common import format_output_json, payload_json, project_id_for
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_INSTRUCTION = (
+    "Analyze the following client inquiry for a construction project and extract key, "
+    "structured requirements. Be precise about 'project_type', 'client_name', 'budget_range', "
+    "'location', and 'desired_features'. Identify any ambiguities or areas requiring clarification. "
+    "Also, suggest immediate next steps for the project lifecycle. "
+    "Format the output STRICTLY as a JSON object with keys like 'parsed_requirements', 'clarification_needed', 'suggested_next_steps'."
+)
+
+# Used when the LLM response cannot be parsed
+_FALLBACK_RESPONSE: Final[Mapping[str, Any]] = MappingProxyType({
+    "parsed_requirements": None, # The raw inquiry is used instead
+    "clarification_needed": "Gemini could not parse inquiry, manual review needed.",
+    "suggested_next_steps": "Manual review of client inquiry."
+})
+
+_PROMPT_TEMPLATE = "Client Inquiry: {client_inquiry}"
+
+class StrategicClientEngagementAgent(BaseConstructionAgent):
+    """
+    The initial entry point agent. It processes raw client inquiries,
+    refines requirements, and provides an initial acknowledgment.
+    It can also act as an aggregator for high-level results or
+    pass the consolidated client data to the next agent in a workflow.
+    """
+    __slots__ = ()
+    input_keys = ()
+    output_keys = ("parsed_data", "project_id")
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Strategic Client Engagement Agent",
+            description="Manages initial client interaction, requirement gathering, and project initiation.",
+            resolver=resolver
+        )
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Processes initial client inquiry to refine requirements and kick off the workflow.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Processes initial client inquiry to refine requirements and kick off the workflow.
+        """
+        client_data = user_input # User input is already structured by main.py's Pydantic model
+
+        logger.info("Client Engagement Agent: Processing new client inquiry for %s", client_data.get('client_name'))
+
+        try:
+            # Use Gemini to parse and refine requirements
+            logger.info("Client Engagement Agent: Calling Gemini to parse requirements...")
+            gemini_parsed_response = await self._generate_json(**self.build_text_request(client_data), response_schema=ClientRequirementsResponse, constrain_output=False, fallback=_FALLBACK_RESPONSE)
+            if gemini_parsed_response is None:
+                return self._error("LLM did not generate a valid response for requirement parsing.")
+
+            parsed_requirements = gemini_parsed_response["parsed_requirements"] or client_data
+            clarification_needed = gemini_parsed_response["clarification_needed"]
+            suggested_next_steps = gemini_parsed_response["suggested_next_steps"]
+
+            if logger.isEnabledFor(logging.INFO): # Skip pretty-printing the requirements when it would be discarded
+                logger.info("Client Engagement Agent: Parsed inquiry: %s", format_output_json({
+                    "parsed_requirements": parsed_requirements,
+                    "clarification_needed": clarification_needed,
+                    "suggested_next_steps": suggested_next_steps,
+                }))
+
+            # Return the processed client data. In a real ADK workflow, this agent might
+            # also send messages to other agents via the resolver.
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "details": "Client inquiry processed. Initial data extracted. Workflow initiated.",
+                "parsed_data": parsed_requirements,
+                "clarifications": clarification_needed,
+                "workflow_suggested": suggested_next_steps,
+                # Derived from the inquiry itself (not the orchestrator's ID), so the same inquiry keeps its ID
+                "project_id": project_id_for({key: value for key, value in client_data.items() if key != "project_id"})
+            }
+
+        except (AttributeError, KeyError, TypeError, ValueError) as e: # Malformed input data; other errors reach the orchestrator
+            logger.error("Client Engagement Agent: Error processing inquiry: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed to process client inquiry: {e}")
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the Gemini request parsing the client inquiry."""
+        prompt = _PROMPT_TEMPLATE.format_map({"client_inquiry": payload_json(user_input)})
+        # The parsed requirements are specific to the client, so near-duplicate inquiries must not share them
+        return dict(prompt=prompt, temperature=0.2, system_instruction=_SYSTEM_INSTRUCTION, semantic_cache_namespace=None, max_output_tokens=1024)
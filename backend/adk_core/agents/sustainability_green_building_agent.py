@@ -1,92 +1,112 @@
-import logging
-import json
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-
-logger = logging.getLogger(__name__)
-
-class SustainabilityGreenBuildingAgent(BaseConstructionAgent):
-    """
-    Focuses on optimizing environmental impact, energy efficiency, and ensuring
-    adherence to green building certifications (e.g., LEED, BREEAM).
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Sustainability & Green Building Agent",
-            description="Optimizes environmental impact and ensures green building compliance.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Assesses the project's sustainability potential and suggests green building strategies.
-        """
-        project_id = user_input.get("project_id")
-        project_description = user_input.get("project_description", "a construction project")
-        architectural_concept = user_input.get("architectural_concept", {})
-        system_design = user_input.get("system_design", {})
-        experiential_design = user_input.get("experiential_design", {})
-
-        logger.info(f"Sustainability Agent: Assessing green building potential for project {project_id}.")
-
-        try:
-            prompt = (
-                f"As a sustainability and green building expert, evaluate the potential for "
-                f"sustainability for a project described as '{project_description}' "
-                f"with architectural style '{architectural_concept.get('design_style_summary')}', "
-                f"structural notes '{system_design.get('structural_notes')}', MEP notes '{system_design.get('mep_notes')}', "
-                f"and materials like '{experiential_design.get('material_palette_notes')}'. "
-                f"Suggest key green building strategies (e.g., energy efficiency, water conservation, material sourcing) "
-                f"and potential certifications (e.g., LEED, BREEAM, Passive House) it could aim for. "
-                f"Output STRICTLY as a JSON object with keys 'sustainability_potential' (string summary), "
-                f"'green_strategies' (list of strings), 'potential_certifications' (list of strings)."
-            )
-            llm_response = self.gemini_service.generate_text(prompt, temperature=0.5)
-
-            if llm_response is None:
-                return {
-                    "agent_name": self.name,
-                    "status": "error",
-                    "message": "LLM did not generate a valid response for sustainability."
-                }
-
-            try:
-                parsed_response = json.loads(llm_response)
-                if not isinstance(parsed_response, dict) or \
-                   'sustainability_potential' not in parsed_response or \
-                   'green_strategies' not in parsed_response or \
-                   'potential_certifications' not in parsed_response:
-                    raise ValueError("LLM response JSON is not in the expected sustainability format.")
-            except json.JSONDecodeError:
-                logger.error(f"Sustainability Agent: Gemini response was not valid JSON: {llm_response}. Using fallback data.")
-                parsed_response = {
-                    "sustainability_potential": "Assessment failed due to parsing error.",
-                    "green_strategies": ["Use energy-efficient lighting", "Recycle construction waste"],
-                    "potential_certifications": ["Green Star"]
-                }
-
-            simulated_sustainability_analysis = {
-                "project_id": project_id,
-                "status": "sustainability_assessment_complete",
-                "sustainability_potential": parsed_response.get("sustainability_potential"),
-                "green_strategies": parsed_response.get("green_strategies"),
-                "potential_certifications": parsed_response.get("potential_certifications")
-            }
-            logger.info(f"Sustainability Agent: Completed sustainability assessment for {project_id}.")
-
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "sustainability_analysis": simulated_sustainability_analysis
-            }
-
-        except Exception as e:
-            logger.error(f"Sustainability Agent: Error during sustainability assessment: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed sustainability assessment for {project_id}: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Any, Final, Mapping, Optional, Sequence
+
+from .base_agent import BaseConstructionAgent
+from .schemas import SustainabilityResponse
+from ..utils.common import template_id, template_key
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_INSTRUCTION = (
+    "As a sustainability and green building expert, evaluate the potential for sustainability "
+    "of the construction project described below. "
+    "Suggest key green building strategies (e.g., energy efficiency, water conservation, material sourcing) "
+    "and potential certifications (e.g., LEED, BREEAM, Passive House) it could aim for."
+)
+
+# Used when the LLM response cannot be parsed
+_FALLBACK_RESPONSE: Final[Mapping[str, Any]] = MappingProxyType({
+    "sustainability_potential": "Assessment failed due to parsing error.",
+    "green_strategies": ("Use energy-efficient lighting", "Recycle construction waste"),
+    "potential_certifications": ("Green Star",)
+})
+
+_PROMPT_TEMPLATE = (
+    "Project description: '{project_description}'. Architectural style: '{design_style_summary}'. "
+    "Structural notes: '{structural_notes}'. MEP notes: '{mep_notes}'. Materials: '{material_palette_notes}'."
+)
+
+# Versioned by the instruction and template text, so editing either invalidates cached responses
+_TEMPLATE_ID: Final[str] = template_id("sustainability", _SYSTEM_INSTRUCTION, _PROMPT_TEMPLATE)
+
+@dataclass(slots=True)
+class SustainabilityAnalysis:
+    """Green building assessment returned as the agent's `sustainability_analysis`."""
+    project_id: Optional[str]
+    status: str
+    sustainability_potential: str
+    green_strategies: Sequence[str]
+    potential_certifications: Sequence[str]
+
+class SustainabilityGreenBuildingAgent(BaseConstructionAgent):
+    """
+    Focuses on optimizing environmental impact, energy efficiency, and ensuring
+    adherence to green building certifications (e.g., LEED, BREEAM).
+    """
+    __slots__ = ()
+    input_keys = ("project_id", "architectural_concept", "system_design", "experiential_design")
+    output_keys = ("sustainability_analysis",)
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Sustainability & Green Building Agent",
+            description="Optimizes environmental impact and ensures green building compliance.",
+            resolver=resolver
+        )
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Assesses the project's sustainability potential and suggests green building strategies.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Assesses the project's sustainability potential and suggests green building strategies.
+        """
+        project_id = user_input.get("project_id")
+
+        logger.info("Sustainability Agent: Assessing green building potential for project %s.", project_id)
+
+        try:
+            parsed_response = await self._generate_json(**self.build_text_request(user_input), fallback=_FALLBACK_RESPONSE)
+            if parsed_response is None:
+                return self._error("LLM did not generate a valid response for sustainability.")
+
+            simulated_sustainability_analysis = SustainabilityAnalysis(
+                project_id=project_id,
+                status="sustainability_assessment_complete",
+                sustainability_potential=parsed_response["sustainability_potential"],
+                green_strategies=parsed_response["green_strategies"],
+                potential_certifications=parsed_response["potential_certifications"]
+            )
+            logger.info("Sustainability Agent: Completed sustainability assessment for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "sustainability_analysis": simulated_sustainability_analysis
+            }
+
+        except Exception as e:
+            logger.error("Sustainability Agent: Error during sustainability assessment: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed sustainability assessment for {project_id}: {e}")
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the Gemini request assessing the project's sustainability."""
+        architectural_concept = user_input.get("architectural_concept", {})
+        system_design = user_input.get("system_design", {})
+        experiential_design = user_input.get("experiential_design", {})
+        slots = {
+            "project_description": user_input.get("project_description", "a construction project"),
+            "design_style_summary": architectural_concept.get("design_style_summary"),
+            "structural_notes": system_design.get("structural_notes"),
+            "mep_notes": system_design.get("mep_notes"),
+            "material_palette_notes": experiential_design.get("material_palette_notes"),
+        }
+        # Keyed on the canonicalized slots, so inputs that only differ in case or spacing share a cached assessment
+        return dict(prompt=_PROMPT_TEMPLATE.format_map(slots), temperature=0.5, system_instruction=_SYSTEM_INSTRUCTION, semantic_cache_namespace=self.name, response_schema=SustainabilityResponse, max_output_tokens=512, template_key=template_key(_TEMPLATE_ID, slots))
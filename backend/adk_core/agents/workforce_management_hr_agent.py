@@ -1,89 +1,104 @@
-import logging
-import json
-from typing import Dict, Any
-
-from .base_agent import BaseConstructionAgent
-from ..services.gemini_service import GeminiService
-
-logger = logging.getLogger(__name__)
-
-class WorkforceManagementHRAgent(BaseConstructionAgent):
-    """
-    Optimizes workforce allocation, manages human resources functions (e.g., onboarding,
-    training, performance), and ensures labor compliance for the construction project.
-    """
-    def __init__(self, resolver):
-        super().__init__(
-            name="Workforce Management & HR Agent",
-            description="Optimizes workforce allocation and manages HR functions.",
-            resolver=resolver
-        )
-        self.gemini_service = GeminiService()
-
-    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Provides preliminary workforce and HR considerations for the project.
-        """
-        project_id = user_input.get("project_id")
-        project_size = user_input.get("project_size", "medium")
-        estimated_schedule = user_input.get("estimated_schedule", {})
-        location = user_input.get("location", "unspecified")
-
-        logger.info(f"Workforce/HR Agent: Assessing workforce and HR needs for project {project_id}.")
-
-        try:
-            prompt = (
-                f"As a construction workforce and HR manager, based on a '{project_size}' size project "
-                f"with an estimated duration of {estimated_schedule.get('total_duration_weeks', 'N/A')} weeks in '{location}', "
-                f"outline the key workforce needs (e.g., required trades, estimated team size), "
-                f"important HR considerations (e.g., recruitment challenges, training needs, labor laws), "
-                f"and basic labor compliance aspects for this type of project. "
-                f"Output STRICTLY as a JSON object with keys 'workforce_needs' (list of strings), "
-                f"'hr_considerations' (list of strings), 'labor_compliance_highlights' (list of strings)."
-            )
-            llm_response = self.gemini_service.generate_text(prompt, temperature=0.5)
-
-            if llm_response is None:
-                return {
-                    "agent_name": self.name,
-                    "status": "error",
-                    "message": "LLM did not generate a valid response for workforce/HR."
-                }
-
-            try:
-                parsed_response = json.loads(llm_response)
-                if not isinstance(parsed_response, dict) or \
-                   'workforce_needs' not in parsed_response or \
-                   'hr_considerations' not in parsed_response or \
-                   'labor_compliance_highlights' not in parsed_response:
-                    raise ValueError("LLM response JSON is not in the expected workforce/HR format.")
-            except json.JSONDecodeError:
-                logger.error(f"Workforce/HR Agent: Gemini response was not valid JSON: {llm_response}. Using fallback data.")
-                parsed_response = {
-                    "workforce_needs": ["Skilled laborers", "Project manager"],
-                    "hr_considerations": ["Competitive salaries", "Safety training"],
-                    "labor_compliance_highlights": ["Local labor laws adherence"]
-                }
-
-            simulated_workforce_hr_analysis = {
-                "project_id": project_id,
-                "status": "workforce_hr_assessment_complete",
-                "workforce_needs": parsed_response.get("workforce_needs"),
-                "hr_considerations": parsed_response.get("hr_considerations"),
-                "labor_compliance_highlights": parsed_response.get("labor_compliance_highlights")
-            }
-            logger.info(f"Workforce/HR Agent: Completed workforce and HR assessment for {project_id}.")
-
-            return {
-                "agent_name": self.name,
-                "status": "success",
-                "workforce_hr_analysis": simulated_workforce_hr_analysis
-            }
-
-        except Exception as e:
-            logger.error(f"Workforce/HR Agent: Error during workforce/HR assessment: {e}", exc_info=True)
-            return {
-                "agent_name": self.name,
-                "status": "error",
-                "message": f"Failed workforce/HR assessment for {project_id}: {str(e)}"
-            }
\ No newline at end of file
+import asyncio
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Any, Final, Mapping, Optional, Sequence
+
+from .base_agent import BaseConstructionAgent
+from .schemas import WorkforceHRResponse
+from ..utils.common import template_id, template_key
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_INSTRUCTION = (
+    "As a construction workforce and HR manager, outline for the project described below "
+    "the key workforce needs (e.g., required trades, estimated team size), "
+    "important HR considerations (e.g., recruitment challenges, training needs, labor laws), "
+    "and basic labor compliance aspects for this type of project."
+)
+
+# Used when the LLM response cannot be parsed
+_FALLBACK_RESPONSE: Final[Mapping[str, Any]] = MappingProxyType({
+    "workforce_needs": ("Skilled laborers", "Project manager"),
+    "hr_considerations": ("Competitive salaries", "Safety training"),
+    "labor_compliance_highlights": ("Local labor laws adherence",)
+})
+
+_PROMPT_TEMPLATE = "Project size: '{project_size}'. Estimated duration: {total_duration_weeks} weeks. Location: '{location}'."
+
+# Versioned by the instruction and template text, so editing either invalidates cached responses
+_TEMPLATE_ID: Final[str] = template_id("workforce_hr", _SYSTEM_INSTRUCTION, _PROMPT_TEMPLATE)
+
+@dataclass(slots=True)
+class WorkforceHRAnalysis:
+    """Workforce and HR outline returned as the agent's `workforce_hr_analysis`."""
+    project_id: Optional[str]
+    status: str
+    workforce_needs: Sequence[str]
+    hr_considerations: Sequence[str]
+    labor_compliance_highlights: Sequence[str]
+
+class WorkforceManagementHRAgent(BaseConstructionAgent):
+    """
+    Optimizes workforce allocation, manages human resources functions (e.g., onboarding,
+    training, performance), and ensures labor compliance for the construction project.
+    """
+    __slots__ = ()
+    input_keys = ("project_id", "estimated_schedule")
+    output_keys = ("workforce_hr_analysis",)
+
+    def __init__(self, resolver):
+        super().__init__(
+            name="Workforce Management & HR Agent",
+            description="Optimizes workforce allocation and manages HR functions.",
+            resolver=resolver
+        )
+
+    def process_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Provides preliminary workforce and HR considerations for the project.
+        Must not be called from a running event loop; use `aprocess_request` there.
+        """
+        return asyncio.run(self.aprocess_request(user_input))
+
+    async def aprocess_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Provides preliminary workforce and HR considerations for the project.
+        """
+        project_id = user_input.get("project_id")
+
+        logger.info("Workforce/HR Agent: Assessing workforce and HR needs for project %s.", project_id)
+
+        try:
+            parsed_response = await self._generate_json(**self.build_text_request(user_input), fallback=_FALLBACK_RESPONSE)
+            if parsed_response is None:
+                return self._error("LLM did not generate a valid response for workforce/HR.")
+
+            simulated_workforce_hr_analysis = WorkforceHRAnalysis(
+                project_id=project_id,
+                status="workforce_hr_assessment_complete",
+                workforce_needs=parsed_response["workforce_needs"],
+                hr_considerations=parsed_response["hr_considerations"],
+                labor_compliance_highlights=parsed_response["labor_compliance_highlights"]
+            )
+            logger.info("Workforce/HR Agent: Completed workforce and HR assessment for %s.", project_id)
+
+            return {
+                "agent_name": self.name,
+                "status": "success",
+                "workforce_hr_analysis": simulated_workforce_hr_analysis
+            }
+
+        except Exception as e:
+            logger.error("Workforce/HR Agent: Error during workforce/HR assessment: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+            return self._error(f"Failed workforce/HR assessment for {project_id}: {e}")
+
+    def build_text_request(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the Gemini request outlining the project's workforce and HR needs."""
+        slots = {
+            "project_size": user_input.get("project_size", "medium"),
+            "total_duration_weeks": user_input.get("estimated_schedule", {}).get("total_duration_weeks", "N/A"),
+            "location": user_input.get("location", "unspecified"),
+        }
+        # Keyed on the canonicalized slots, so inputs that only differ in case or spacing share a cached outline
+        return dict(prompt=_PROMPT_TEMPLATE.format_map(slots), temperature=0.5, system_instruction=_SYSTEM_INSTRUCTION, semantic_cache_namespace=self.name, response_schema=WorkforceHRResponse, max_output_tokens=512, template_key=template_key(_TEMPLATE_ID, slots))
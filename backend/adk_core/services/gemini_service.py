@@ -1,79 +1,786 @@
-from google.cloud import aiplatform
-from google.generativeai.types import GenerateContentResponse
-from vertexai.vision_models import ImageGenerationModel
-from typing import Optional
-from io import BytesIO
-import base64
-import json # For parsing structured responses if needed
-
-from ...config.settings import settings
-
-class GeminiService:
-    def __init__(self):
-        # Initialize Vertex AI SDK. This needs project and location.
-        # It's defensive here; ideally, it's globally managed.
-        try:
-            aiplatform.init(project=settings.PROJECT_ID, location=settings.LOCATION)
-            self.gemini_model = aiplatform.GenerativeModel(settings.GEMINI_MODEL_NAME)
-            self.imagen_model = ImageGenerationModel.from_pretrained("imagen-3.0-generate-002")
-            print(f"GeminiService initialized with models: {settings.GEMINI_MODEL_NAME}, imagen-3.0-generate-002")
-        except Exception as e:
-            print(f"ERROR: Failed to initialize Vertex AI for GeminiService: {e}")
-            self.gemini_model = None
-            self.imagen_model = None
-            import traceback
-            traceback.print_exc()
-
-    def generate_text(self, prompt: str, temperature: float = 0.4) -> Optional[str]:
-        """
-        Generates text using the configured Gemini model.
-        Returns the generated text string, or None if generation fails or no content is produced.
-        """
-        if self.gemini_model is None:
-            print("GeminiService (text model) is not initialized. Cannot generate text.")
-            return None
-
-        try:
-            response: GenerateContentResponse = self.gemini_model.generate_content(
-                prompt,
-                generation_config=aiplatform.types.GenerationConfig(temperature=temperature),
-            )
-            if response.candidates:
-                if response.candidates[0].content.parts:
-                    return response.candidates[0].content.parts[0].text
-            return None
-        except Exception as e:
-            print(f"Error calling Gemini Text API for prompt '{prompt[:100]}...': {e}")
-            import traceback
-            traceback.print_exc()
-            return None
-
-    def generate_image(self, prompt: str) -> Optional[str]:
-        """
-        Generates an image from a text prompt using the Imagen model.
-        Returns base64 encoded image string, or None if generation fails.
-        """
-        if self.imagen_model is None:
-            print("GeminiService (image model) is not initialized. Cannot generate image.")
-            return None
-
-        try:
-            print(f"Calling Imagen for prompt: {prompt[:100]}...")
-            images = self.imagen_model.generate_images(
-                prompt=prompt,
-                number_of_images=1
-            )
-            if images.images and len(images.images) > 0:
-                buffered = BytesIO()
-                images.images[0].save(buffered, format="PNG")
-                img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-                print("Imagen image generation successful.")
-                return img_str
-            else:
-                print("Imagen image generation response missing image.")
-                return None
-        except Exception as e:
-            print(f"Error generating image with Imagen for prompt '{prompt[:100]}...': {e}")
-            import traceback
-            traceback.print_exc()
-            return None
\ No newline at end of file
+from google.cloud import aiplatform
+from google.cloud import storage
+from google.api_core import exceptions as google_exceptions
+from google.cloud.aiplatform_v1beta1 import PredictionServiceClient
+from google.generativeai.types import GenerateContentResponse
+from vertexai.vision_models import ImageGenerationModel
+from vertexai.language_models import TextEmbeddingModel
+from vertexai.batch_prediction import BatchPredictionJob
+from vertexai.preview import caching
+from vertexai.preview.generative_models import GenerativeModel as PreviewGenerativeModel
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+import numpy as np
+import orjson
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import datetime
+from google.protobuf import json_format
+from google.protobuf.struct_pb2 import Value
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+try:
+    from pybase64 import b64decode, b64encode
+except ImportError: # pybase64 is optional; it is a SIMD-accelerated drop-in for the stdlib functions
+    from base64 import b64decode, b64encode
+
+from .llm_cache import LLMCache
+from .semantic_cache import SemanticLLMCache
+from ...config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGEN_MODEL_NAME = "imagen-3.0-generate-002"
+EMBEDDING_MODEL_NAME = "text-embedding-004" # Used by the semantic response cache
+RESPONSE_CACHE_MAX_ENTRIES = 2048 # Upper bound on cached text/image responses kept in process memory
+CONTEXT_CACHE_TTL_SECONDS = 3600 # Lifetime of server-side cached prompt prefixes
+BATCH_POLL_INTERVAL_SECONDS = 30 # How often a running batch prediction job is checked for completion
+RENDER_URL_TTL_SECONDS = 7 * 24 * 3600 # Lifetime of signed render URLs; V4 signing allows at most seven days
+
+# Transient Vertex AI errors (overload, quota, timeout) are retried with exponential
+# backoff, so a brief outage does not fail the agent and force a full pipeline re-run.
+# The jitter spreads out the retries of agents that were rate-limited together.
+_retry_transient_errors = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception_type((
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.DeadlineExceeded,
+    )),
+    reraise=True,
+)
+
+def _response_cache_key(model_name: str, prompt: str, temperature: Optional[float] = None) -> str:
+    """
+    Builds the response cache key for a model call. Whitespace in the prompt is
+    normalized so prompts that only differ in formatting share an entry.
+    """
+    normalized_prompt = " ".join(prompt.split())
+    return hashlib.blake2b(f"{model_name}|{temperature}|{normalized_prompt}".encode("utf-8")).hexdigest()
+
+# Worker threads for blocking Vertex AI SDK calls made from async code. The default executor
+# is sized by CPU count, whereas these threads mostly wait on the network.
+_LLM_POOL = ThreadPoolExecutor(max_workers=settings.LLM_THREAD_POOL_SIZE, thread_name_prefix="gemini")
+
+async def run_blocking(fn, *args):
+    """Runs the blocking call `fn(*args)` on the shared Vertex AI worker pool and awaits its result."""
+    return await asyncio.get_running_loop().run_in_executor(_LLM_POOL, functools.partial(fn, *args))
+
+@functools.lru_cache(maxsize=None)
+def _to_response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Converts a pydantic model into the OpenAPI schema subset Gemini accepts as `response_schema`:
+    references to nested models are inlined and JSON-Schema-only keywords are dropped.
+    """
+    json_schema = model.model_json_schema()
+    definitions = json_schema.pop("$defs", {})
+
+    def convert(node: Any) -> Any:
+        if isinstance(node, list):
+            return [convert(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if "$ref" in node:
+            return convert(definitions[node["$ref"].rsplit("/", 1)[-1]])
+        converted = {}
+        for key, value in node.items():
+            if key in ("title", "default"):
+                continue
+            if key == "properties": # Keys here are field names, not keywords
+                converted[key] = {name: convert(prop) for name, prop in value.items()}
+            else:
+                converted[key] = convert(value)
+        return converted
+
+    return convert(json_schema)
+
+def _to_rest_schema(node: Any) -> Any:
+    """Returns a `_to_response_schema` schema with its types in the enum form the REST API expects ("OBJECT")."""
+    if isinstance(node, list):
+        return [_to_rest_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    return {key: value.upper() if key == "type" and isinstance(value, str) else _to_rest_schema(value) for key, value in node.items()}
+
+def _encoded_image_bytes(image: Any) -> bytes:
+    """
+    Returns the encoded (PNG) bytes of an Imagen image as returned, without decoding and
+    re-encoding them. They are read from the SDK's private `_image_bytes` attribute; should
+    a release drop it, the image is written out through the public `save` instead.
+    """
+    image_bytes = getattr(image, "_image_bytes", None)
+    if image_bytes is not None:
+        return image_bytes
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "render.png")
+        image.save(path)
+        with open(path, "rb") as image_file:
+            return image_file.read()
+
+class GeminiService:
+    def __init__(self, prediction_service_client: Optional[PredictionServiceClient] = None):
+        # Shared low-level Vertex AI client, injected by the ADK system so that
+        # its transport is reused instead of being rebuilt here.
+        self.prediction_service_client = prediction_service_client
+        # Cache of successful responses keyed by `_response_cache_key`, so retries
+        # and re-runs with identical prompts skip the API round-trip.
+        self._response_cache = LLMCache(
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            redis_url=settings.REDIS_URL,
+        )
+        self._storage_client: Optional[storage.Client] = None # Created on first render upload
+        self._imagen_model: Optional[ImageGenerationModel] = None # Loaded on first render, see `imagen_model`
+        self._imagen_model_lock = threading.Lock()
+        self._semantic_cache: Optional[SemanticLLMCache] = None # Enabled by SEMANTIC_CACHE_THRESHOLD
+        # Server-side cached prompt prefixes (Gemini context caching), keyed by the
+        # system instruction text: (cached content name or None, expiry timestamp).
+        self._context_caches: Dict[str, Tuple[Optional[str], float]] = {}
+        self._context_cache_models: Dict[str, PreviewGenerativeModel] = {}
+        self._context_cache_lock = threading.Lock()
+        # (event loop, request key) -> response future of the in-flight `generate_text_async` call
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        # Per event loop, since asyncio primitives cannot be shared between loops
+        self._request_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        # Initialize Vertex AI SDK. This needs project and location.
+        # It's defensive here; ideally, it's globally managed.
+        try:
+            # gRPC explicitly, so Gemini calls share one long-lived HTTP/2 connection rather than REST requests
+            aiplatform.init(project=settings.PROJECT_ID, location=settings.LOCATION, api_transport="grpc")
+            self.gemini_model = aiplatform.GenerativeModel(settings.GEMINI_MODEL_NAME)
+            if settings.SEMANTIC_CACHE_THRESHOLD is not None:
+                self.embedding_model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+                self._semantic_cache = SemanticLLMCache(self._embed_text, threshold=settings.SEMANTIC_CACHE_THRESHOLD)
+            logger.info("GeminiService initialized with model: %s", settings.GEMINI_MODEL_NAME)
+        except Exception as e:
+            logger.error("Failed to initialize Vertex AI for GeminiService: %s", e, exc_info=True)
+            self.gemini_model = None
+
+    @property
+    def imagen_model(self) -> Optional[ImageGenerationModel]:
+        """
+        The Imagen model, loaded on first use: loading it fetches the model's metadata
+        over the network, which text-only workloads never need. None if it cannot be loaded.
+        """
+        if self._imagen_model is None and self.gemini_model is not None: # Only once Vertex AI is initialized
+            with self._imagen_model_lock:
+                if self._imagen_model is None: # Re-check, another thread may have loaded it
+                    try:
+                        self._imagen_model = ImageGenerationModel.from_pretrained(IMAGEN_MODEL_NAME)
+                        logger.info("GeminiService loaded image model: %s", IMAGEN_MODEL_NAME)
+                    except Exception as e:
+                        logger.error("Failed to load Imagen model %s: %s", IMAGEN_MODEL_NAME, e)
+        return self._imagen_model
+
+    def _get_cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        return self._response_cache.get(cache_key) if cache_key is not None else None
+
+    def _cache_response(self, cache_key: Optional[str], response: str) -> None:
+        if cache_key is not None:
+            self._response_cache.set(cache_key, response)
+
+    def create_cached_prefix(self, system_instruction: str, ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS) -> Optional[str]:
+        """
+        Registers a static prompt prefix as Gemini cached content, so it is stored server-side
+        instead of being re-sent and re-billed on every call.
+        Returns the cached content resource name, or None if the cache could not be created
+        (e.g. the prefix is below the model's minimum cacheable size).
+        """
+        try:
+            cached_content = caching.CachedContent.create(
+                model_name=settings.GEMINI_MODEL_NAME,
+                system_instruction=system_instruction,
+                ttl=datetime.timedelta(seconds=ttl_seconds),
+            )
+            logger.info("GeminiService created context cache: %s", cached_content.name)
+            return cached_content.name
+        except Exception as e:
+            logger.warning("GeminiService could not create context cache, sending prefix inline: %s", e)
+            return None
+
+    def _get_context_cache_model(self, system_instruction: str) -> Optional[PreviewGenerativeModel]:
+        """
+        Returns a model bound to the cached content for `system_instruction`, creating the
+        cache on first use and again once it has expired. Returns None if caching is unavailable;
+        the failure is remembered for one TTL so each call does not retry the creation.
+        """
+        with self._context_cache_lock:
+            cache_name, expires_at = self._context_caches.get(system_instruction, (None, 0.0))
+            if time.monotonic() >= expires_at:
+                self._context_cache_models.pop(system_instruction, None)
+                cache_name = self.create_cached_prefix(system_instruction)
+                # Refresh slightly before the server-side TTL runs out
+                expires_at = time.monotonic() + CONTEXT_CACHE_TTL_SECONDS - 60
+                self._context_caches[system_instruction] = (cache_name, expires_at)
+            if cache_name is None:
+                return None
+            if system_instruction not in self._context_cache_models:
+                self._context_cache_models[system_instruction] = PreviewGenerativeModel.from_cached_content(
+                    cached_content=cache_name
+                )
+            return self._context_cache_models[system_instruction]
+
+    @staticmethod
+    def _full_prompt(prompt: str, system_instruction: Optional[str]) -> str:
+        """Returns the prompt sent when `system_instruction` is not served from a context cache."""
+        return f"{system_instruction}\n\n{prompt}" if system_instruction else prompt
+
+    def _text_request_key(self, prompt: str, temperature: float, response_schema: Optional[Type[BaseModel]] = None, max_output_tokens: Optional[int] = None) -> str:
+        """Returns a key identifying a text call, from everything that determines its response."""
+        model_name = settings.GEMINI_MODEL_NAME
+        if response_schema is not None:
+            model_name += f":{response_schema.__name__}"
+        if max_output_tokens is not None:
+            model_name += f":max{max_output_tokens}"
+        return _response_cache_key(model_name, prompt, temperature)
+
+    def _text_cache_key(self, prompt: str, temperature: float, response_schema: Optional[Type[BaseModel]] = None, max_output_tokens: Optional[int] = None) -> Optional[str]:
+        """
+        Returns the response cache key for a text call, or None if the call should not be cached:
+        above `LLM_CACHE_MAX_TEMPERATURE` callers are asking for varied output, not a replay.
+        """
+        if temperature > settings.LLM_CACHE_MAX_TEMPERATURE:
+            return None
+        return self._text_request_key(prompt, temperature, response_schema, max_output_tokens)
+
+    def _generation_config(self, temperature: float, response_schema: Optional[Type[BaseModel]] = None, max_output_tokens: Optional[int] = None):
+        """
+        Builds the generation config, requesting schema-constrained JSON when `response_schema`
+        is given and capping the response length when `max_output_tokens` is.
+        """
+        config = {"temperature": temperature}
+        if response_schema is not None:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = _to_response_schema(response_schema)
+        if max_output_tokens is not None:
+            config["max_output_tokens"] = max_output_tokens
+        return aiplatform.types.GenerationConfig(**config)
+
+    @_retry_transient_errors
+    def _generate_content(self, model, contents: str, generation_config) -> GenerateContentResponse:
+        """Calls `generate_content` on `model`, retrying transient errors."""
+        return model.generate_content(contents, generation_config=generation_config)
+
+    @_retry_transient_errors
+    async def _stream_content_async(self, model, contents: str, generation_config) -> Optional[str]:
+        """
+        Streams the response of `model` on the SDK's native async call and returns its text,
+        or None if no text was produced. Chunks are collected while Gemini is still generating,
+        so only parsing is left once the last one arrives; transient errors retry the whole stream.
+        """
+        chunks = []
+        async for chunk in await model.generate_content_async(contents, generation_config=generation_config, stream=True):
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                chunks.append(chunk.candidates[0].content.parts[0].text)
+        return "".join(chunks) if chunks else None
+
+    def _request_semaphore(self) -> asyncio.Semaphore:
+        """Returns the semaphore bounding concurrent Gemini text requests on the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._request_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._request_semaphores[loop] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENT_REQUESTS)
+        return semaphore
+
+    def _response_text(self, response: GenerateContentResponse) -> Optional[str]:
+        """Returns the text of the first candidate in `response`."""
+        if response.candidates:
+            if response.candidates[0].content.parts:
+                return response.candidates[0].content.parts[0].text
+        return None
+
+    def _cache_text(self, text: str, response_schema: Optional[Type[BaseModel]], cache_key: Optional[str], semantic_cache_namespace: Optional[str], temperature: float, embedding: Optional[np.ndarray]) -> None:
+        """
+        Caches a generated text under `cache_key` and, when its prompt was embedded, in the semantic cache.
+        A response that does not match its `response_schema` is not cached, so the next call retries it.
+        """
+        if response_schema is not None:
+            try:
+                response_schema.model_validate_json(text)
+            except ValidationError:
+                return
+        self._cache_response(cache_key, text)
+        if embedding is not None:
+            self._semantic_cache.add(semantic_cache_namespace, temperature, embedding, text)
+
+    def _embed_text(self, text: str) -> List[float]:
+        """Returns the embedding of `text` from the configured embedding model."""
+        return self.embedding_model.get_embeddings([text])[0].values
+
+    def _semantic_cache_lookup(self, namespace: Optional[str], prompt: str, temperature: float) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Looks `prompt` up in the semantic cache. Returns the cached response, if any, and the
+        prompt's embedding for caching the eventual response; the embedding is None when the
+        semantic cache does not apply to this call.
+        """
+        if self._semantic_cache is None or namespace is None or temperature > settings.LLM_CACHE_MAX_TEMPERATURE:
+            return None, None
+        try:
+            embedding = self._semantic_cache.embed(prompt)
+        except Exception as e:
+            logger.warning("GeminiService could not embed prompt for the semantic cache, skipping it: %s", e)
+            return None, None
+        return self._semantic_cache.lookup(namespace, temperature, embedding), embedding
+
+    def generate_text(self, prompt: str, temperature: float = 0.4, system_instruction: Optional[str] = None, semantic_cache_namespace: Optional[str] = None, response_schema: Optional[Type[BaseModel]] = None, max_output_tokens: Optional[int] = None, template_key: Optional[str] = None) -> Optional[str]:
+        """
+        Generates text using the configured Gemini model.
+        Returns the generated text string, or None if generation fails or no content is produced.
+        Successful responses are cached per (model, temperature, prompt) when `temperature`
+        is at most `LLM_CACHE_MAX_TEMPERATURE`. With a `semantic_cache_namespace` (usually the
+        agent's name) and the semantic cache enabled, a near-duplicate prompt previously sent
+        under that namespace also counts as a hit.
+        A static `system_instruction` prefix is served from Gemini context caching when possible,
+        with only `prompt` sent per call; otherwise it is prepended to the prompt.
+        With a `response_schema`, Gemini is constrained to return JSON matching that model.
+        `max_output_tokens` caps the response length, and with it the generation time.
+        A `template_key` (see `utils.common.template_key`) names the prompt's template and its
+        canonicalized slots; the response cache is then keyed on it instead of the prompt text,
+        so prompts from one template that differ only in details left out of the key share a response.
+        """
+        if self.gemini_model is None:
+            logger.error("GeminiService (text model) is not initialized. Cannot generate text.")
+            return None
+
+        full_prompt = self._full_prompt(prompt, system_instruction)
+        cache_key = self._text_cache_key(template_key or full_prompt, temperature, response_schema, max_output_tokens)
+        cached_text = self._get_cached_response(cache_key)
+        if cached_text is not None:
+            return cached_text
+        cached_text, embedding = self._semantic_cache_lookup(semantic_cache_namespace, full_prompt, temperature)
+        if cached_text is not None:
+            return cached_text
+
+        try:
+            model, contents = self.gemini_model, full_prompt
+            if system_instruction:
+                cached_model = self._get_context_cache_model(system_instruction)
+                if cached_model is not None:
+                    model, contents = cached_model, prompt
+            response = self._generate_content(model, contents, self._generation_config(temperature, response_schema, max_output_tokens))
+            text = self._response_text(response)
+            if text is not None:
+                self._cache_text(text, response_schema, cache_key, semantic_cache_namespace, temperature, embedding)
+            return text
+        except Exception as e:
+            logger.error("Error calling Gemini Text API for prompt '%.100s...': %s", prompt, e, exc_info=True)
+            return None
+
+    async def generate_text_async(self, prompt: str, temperature: float = 0.4, system_instruction: Optional[str] = None, semantic_cache_namespace: Optional[str] = None, response_schema: Optional[Type[BaseModel]] = None, max_output_tokens: Optional[int] = None, template_key: Optional[str] = None) -> Optional[str]:
+        """
+        Asynchronous variant of `generate_text`, with the same arguments, caching and fallbacks.
+        The response is streamed on the SDK's async transport, so many agents' calls can be
+        in flight on one event loop without holding a thread each.
+        Identical calls made while one is in flight on the same event loop wait for its
+        response instead of sending their own request. At most `LLM_MAX_CONCURRENT_REQUESTS`
+        requests run at once per event loop, and one taking longer than
+        `LLM_REQUEST_TIMEOUT_SECONDS` (retries included) fails with None.
+        """
+        if self.gemini_model is None:
+            logger.error("GeminiService (text model) is not initialized. Cannot generate text.")
+            return None
+
+        full_prompt = self._full_prompt(prompt, system_instruction)
+        # Futures belong to their event loop, so in-flight calls are only shared within one
+        inflight_key = (asyncio.get_running_loop(), self._text_request_key(full_prompt, temperature, response_schema, max_output_tokens))
+        inflight = self._inflight.get(inflight_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight) # A cancelled waiter must not cancel the shared call
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
+        try:
+            text = await self._generate_text_async(prompt, full_prompt, temperature, system_instruction, semantic_cache_namespace, response_schema, max_output_tokens, template_key)
+            future.set_result(text)
+            return text
+        finally:
+            del self._inflight[inflight_key]
+            if not future.done():
+                future.cancel() # This call was cancelled; its waiters are too
+
+    async def _generate_text_async(self, prompt: str, full_prompt: str, temperature: float, system_instruction: Optional[str], semantic_cache_namespace: Optional[str], response_schema: Optional[Type[BaseModel]], max_output_tokens: Optional[int], template_key: Optional[str]) -> Optional[str]:
+        """Serves one `generate_text_async` call from the caches or, failing that, from Gemini."""
+        cache_key = self._text_cache_key(template_key or full_prompt, temperature, response_schema, max_output_tokens)
+        cached_text = self._get_cached_response(cache_key)
+        if cached_text is not None:
+            return cached_text
+        cached_text, embedding = await run_blocking(
+            self._semantic_cache_lookup, semantic_cache_namespace, full_prompt, temperature
+        )
+        if cached_text is not None:
+            return cached_text
+
+        try:
+            model, contents = self.gemini_model, full_prompt
+            if system_instruction:
+                # Creating the context cache is a blocking call, made at most once per TTL
+                cached_model = await run_blocking(self._get_context_cache_model, system_instruction)
+                if cached_model is not None:
+                    model, contents = cached_model, prompt
+            async with self._request_semaphore():
+                text = await asyncio.wait_for(
+                    self._stream_content_async(model, contents, self._generation_config(temperature, response_schema, max_output_tokens)),
+                    timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+                )
+            if text is not None:
+                self._cache_text(text, response_schema, cache_key, semantic_cache_namespace, temperature, embedding)
+            return text
+        except Exception as e:
+            logger.error("Error calling Gemini Text API for prompt '%.100s...': %s", prompt, e, exc_info=True)
+            return None
+
+    def _batch_request_line(self, index: int, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Builds the batch prediction input line for a `generate_text` request, labelled with its index."""
+        generation_config: Dict[str, Any] = {"temperature": request.get("temperature", 0.4)}
+        if request.get("response_schema") is not None:
+            generation_config["responseMimeType"] = "application/json"
+            generation_config["responseSchema"] = _to_rest_schema(_to_response_schema(request["response_schema"]))
+        if request.get("max_output_tokens") is not None:
+            generation_config["maxOutputTokens"] = request["max_output_tokens"]
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": request["prompt"]}]}],
+            "generationConfig": generation_config,
+            "labels": {"batch_index": str(index)}, # Echoed in the output, whose lines are unordered
+        }
+        if request.get("system_instruction"):
+            body["systemInstruction"] = {"parts": [{"text": request["system_instruction"]}]}
+        return {"request": body}
+
+    def _run_batch_prediction(self, requests: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Runs `generate_text` requests as one Vertex AI batch prediction job staged in
+        `BATCH_PREDICTION_BUCKET`, and blocks until it ends. Returns the response texts
+        in request order, None for requests that produced no text.
+        """
+        if self._storage_client is None:
+            self._storage_client = storage.Client(project=settings.PROJECT_ID)
+        bucket = self._storage_client.bucket(settings.BATCH_PREDICTION_BUCKET)
+        job_prefix = f"batch_prediction/{uuid.uuid4().hex}"
+        bucket.blob(f"{job_prefix}/input.jsonl").upload_from_string(
+            b"\n".join(orjson.dumps(self._batch_request_line(i, request)) for i, request in enumerate(requests)),
+            content_type="application/jsonl",
+        )
+        job = BatchPredictionJob.submit(
+            source_model=settings.GEMINI_MODEL_NAME,
+            input_dataset=f"gs://{settings.BATCH_PREDICTION_BUCKET}/{job_prefix}/input.jsonl",
+            output_uri_prefix=f"gs://{settings.BATCH_PREDICTION_BUCKET}/{job_prefix}/output",
+        )
+        logger.info("Submitted Gemini batch prediction job %s for %d requests.", job.resource_name, len(requests))
+        while not job.has_ended:
+            time.sleep(BATCH_POLL_INTERVAL_SECONDS)
+            job.refresh()
+        if not job.has_succeeded:
+            raise RuntimeError(f"batch prediction job {job.resource_name} failed: {job.error}")
+
+        texts: List[Optional[str]] = [None] * len(requests)
+        output_prefix = job.output_location.removeprefix(f"gs://{settings.BATCH_PREDICTION_BUCKET}/")
+        for blob in bucket.list_blobs(prefix=output_prefix):
+            if not blob.name.endswith(".jsonl"):
+                continue
+            for line in blob.download_as_bytes().splitlines():
+                result = orjson.loads(line)
+                candidates = (result.get("response") or {}).get("candidates") or []
+                parts = candidates[0].get("content", {}).get("parts") if candidates else None
+                if parts:
+                    texts[int(result["request"]["labels"]["batch_index"])] = parts[0].get("text")
+        return texts
+
+    def generate_text_batch(self, requests: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Generates the response to each request, given as `generate_text` keyword arguments,
+        for offline workloads such as re-runs and evaluations. Uncached requests are submitted
+        as one Vertex AI batch prediction job, which is billed at a discount and has its own
+        quota, but can take minutes to hours, so this is not for interactive use. Responses
+        share the response cache with `generate_text`. Without `BATCH_PREDICTION_BUCKET`, or
+        if the job fails, the uncached requests are sent one by one.
+        Returns the generated texts in request order, None for requests that failed.
+        """
+        if self.gemini_model is None:
+            logger.error("GeminiService (text model) is not initialized. Cannot generate text.")
+            return [None] * len(requests)
+
+        cache_keys = [
+            self._text_cache_key(
+                request.get("template_key") or self._full_prompt(request["prompt"], request.get("system_instruction")),
+                request.get("temperature", 0.4), request.get("response_schema"), request.get("max_output_tokens"),
+            )
+            for request in requests
+        ]
+        texts: List[Optional[str]] = [self._get_cached_response(cache_key) for cache_key in cache_keys]
+        pending = [i for i, text in enumerate(texts) if text is None]
+        if not pending:
+            return texts
+        if not settings.BATCH_PREDICTION_BUCKET:
+            logger.info("GeminiService: BATCH_PREDICTION_BUCKET is not configured. Sending batched requests one by one.")
+            return [text if text is not None else self.generate_text(**request) for text, request in zip(texts, requests)]
+
+        try:
+            batch_texts = self._run_batch_prediction([requests[i] for i in pending])
+        except Exception as e:
+            logger.warning("Error running Gemini batch prediction, sending requests one by one: %s", e)
+            return [text if text is not None else self.generate_text(**request) for text, request in zip(texts, requests)]
+
+        for i, text in zip(pending, batch_texts):
+            if text is not None:
+                texts[i] = text
+                self._cache_text(text, requests[i].get("response_schema"), cache_keys[i], None, requests[i].get("temperature", 0.4), None)
+        return texts
+
+    @_retry_transient_errors
+    def _generate_images(self, prompt: str):
+        """Calls Imagen for a single image, retrying transient errors."""
+        return self.imagen_model.generate_images(
+            prompt=prompt,
+            number_of_images=1
+        )
+
+    def _image_cache_path(self, prompt: str) -> Optional[str]:
+        """Returns the file holding the render for `prompt` under `IMAGE_CACHE_DIR`, or None if that is not set."""
+        if not settings.IMAGE_CACHE_DIR:
+            return None
+        return os.path.join(settings.IMAGE_CACHE_DIR, f"{_response_cache_key(IMAGEN_MODEL_NAME, prompt)}.png")
+
+    def _read_cached_image(self, prompt: str) -> Optional[bytes]:
+        """Returns the render for `prompt` saved under `IMAGE_CACHE_DIR`, or None if there is none."""
+        path = self._image_cache_path(prompt)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as image_file:
+                return image_file.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("GeminiService could not read cached render '%s', regenerating it: %s", path, e)
+            return None
+
+    def _write_cached_image(self, prompt: str, image_bytes: bytes) -> None:
+        """Saves the render for `prompt` under `IMAGE_CACHE_DIR`, if set."""
+        path = self._image_cache_path(prompt)
+        if path is None:
+            return
+        try:
+            os.makedirs(settings.IMAGE_CACHE_DIR, exist_ok=True)
+            # Written under a unique name and renamed into place, so readers never see a partial file
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "wb") as image_file:
+                image_file.write(image_bytes)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("GeminiService could not cache render '%s': %s", path, e)
+
+    def _generate_image_bytes(self, prompt: str) -> Optional[bytes]:
+        """
+        Generates an image from a text prompt using the Imagen model.
+        Returns the PNG bytes as returned by Imagen, or None if generation fails.
+        Renders saved under `IMAGE_CACHE_DIR` are read back instead of regenerated.
+        """
+        image_bytes = self._read_cached_image(prompt)
+        if image_bytes is None:
+            image_bytes = self._render_image_bytes(prompt)
+            if image_bytes is not None:
+                self._write_cached_image(prompt, image_bytes)
+        return image_bytes
+
+    def _render_image_bytes(self, prompt: str) -> Optional[bytes]:
+        """Calls Imagen for `prompt` and returns the PNG bytes, or None if generation fails."""
+        if self.imagen_model is None:
+            logger.error("GeminiService (image model) is not initialized. Cannot generate image.")
+            return None
+
+        try:
+            logger.debug("Calling Imagen for prompt: %.100s...", prompt)
+            images = self._generate_images(prompt)
+            if images.images and len(images.images) > 0:
+                logger.debug("Imagen image generation successful.")
+                return _encoded_image_bytes(images.images[0])
+            else:
+                logger.warning("Imagen image generation response missing image.")
+                return None
+        except Exception as e:
+            logger.error("Error generating image with Imagen for prompt '%.100s...': %s", prompt, e, exc_info=True)
+            return None
+
+    def generate_image(self, prompt: str) -> Optional[str]:
+        """
+        Generates an image from a text prompt using the Imagen model.
+        Returns base64 encoded image string, or None if generation fails.
+        Successful renders are cached per prompt.
+        """
+        cache_key = _response_cache_key(IMAGEN_MODEL_NAME, prompt)
+        cached_image = self._get_cached_response(cache_key)
+        if cached_image is not None:
+            return cached_image
+
+        image_bytes = self._generate_image_bytes(prompt)
+        if image_bytes is None:
+            return None
+        img_str = b64encode(image_bytes).decode("ascii")
+        self._cache_response(cache_key, img_str)
+        return img_str
+
+    async def generate_image_async(self, prompt: str) -> Optional[str]:
+        """
+        Asynchronous variant of `generate_image`. The Imagen SDK is blocking, so the call
+        runs in a worker thread, allowing several renders to be awaited concurrently.
+        """
+        return await run_blocking(self.generate_image, prompt)
+
+    @_retry_transient_errors
+    def _predict(self, **request):
+        """Calls `predict` on the shared PredictionServiceClient, retrying transient errors."""
+        return self.prediction_service_client.predict(**request)
+
+    def _predict_images_bytes(self, prompts: List[str]) -> List[Optional[bytes]]:
+        """
+        Generates one image per prompt with a single Imagen `predict` RPC carrying all prompts
+        as instances. Returns the raw PNG bytes in prompt order, None for prompts that failed.
+        Falls back to one call per prompt if the batched call cannot be made.
+        """
+        if self.prediction_service_client is None:
+            return [self._render_image_bytes(prompt) for prompt in prompts]
+
+        try:
+            logger.debug("Calling Imagen for a batch of %d prompts...", len(prompts))
+            endpoint = (
+                f"projects/{settings.PROJECT_ID}/locations/{settings.LOCATION}"
+                f"/publishers/google/models/{IMAGEN_MODEL_NAME}"
+            )
+            response = self._predict(
+                endpoint=endpoint,
+                instances=[json_format.ParseDict({"prompt": prompt}, Value()) for prompt in prompts],
+                parameters=json_format.ParseDict({"sampleCount": 1}, Value()),
+            )
+            predictions = [dict(prediction) for prediction in response.predictions]
+            if len(predictions) != len(prompts):
+                logger.warning("Imagen batch returned %d images for %d prompts.", len(predictions), len(prompts))
+            images_bytes: List[Optional[bytes]] = []
+            for i in range(len(prompts)):
+                encoded = predictions[i].get("bytesBase64Encoded") if i < len(predictions) else None
+                images_bytes.append(b64decode(encoded) if encoded else None)
+            logger.debug("Imagen batch image generation completed.")
+            return images_bytes
+        except Exception as e:
+            logger.warning("Error generating Imagen batch, falling back to one call per prompt: %s", e)
+            return [self._render_image_bytes(prompt) for prompt in prompts]
+
+    def _generate_images_bytes(self, prompts: List[str]) -> List[Optional[bytes]]:
+        """
+        Batch counterpart of `_generate_image_bytes`: renders saved under `IMAGE_CACHE_DIR` are
+        read back, and only the remaining prompts are sent, together, to `_predict_images_bytes`.
+        """
+        images_bytes = [self._read_cached_image(prompt) for prompt in prompts]
+        missing = [i for i, image_bytes in enumerate(images_bytes) if image_bytes is None]
+        if missing:
+            for i, image_bytes in zip(missing, self._predict_images_bytes([prompts[i] for i in missing])):
+                if image_bytes is not None:
+                    images_bytes[i] = image_bytes
+                    self._write_cached_image(prompts[i], image_bytes)
+        return images_bytes
+
+    def generate_images_batch(self, prompts: List[str]) -> List[Optional[str]]:
+        """
+        Generates one image per prompt, requesting all uncached prompts in a single Imagen call.
+        Returns base64 encoded image strings in prompt order, None for prompts that failed.
+        Shares the per-prompt cache with `generate_image`.
+        """
+        cache_keys = [_response_cache_key(IMAGEN_MODEL_NAME, prompt) for prompt in prompts]
+        images: List[Optional[str]] = [self._get_cached_response(cache_key) for cache_key in cache_keys]
+        pending = [i for i, image in enumerate(images) if image is None]
+        if not pending:
+            return images
+
+        for i, image_bytes in zip(pending, self._generate_images_bytes([prompts[i] for i in pending])):
+            if image_bytes is not None:
+                images[i] = b64encode(image_bytes).decode("ascii")
+                self._cache_response(cache_keys[i], images[i])
+        return images
+
+    async def generate_images_batch_async(self, prompts: List[str]) -> List[Optional[str]]:
+        """Asynchronous variant of `generate_images_batch`, run in a worker thread."""
+        return await run_blocking(self.generate_images_batch, prompts)
+
+    def generate_image_to_storage(self, prompt: str) -> Optional[Tuple[str, str]]:
+        """
+        Generates an image from a text prompt using the Imagen model and uploads the PNG
+        to the `RENDERS_BUCKET` Cloud Storage bucket under a content-addressed key,
+        so callers only need to hold a constant-size reference to the render.
+        Returns a (gcs_uri, sha256) tuple, or None if generation or upload fails.
+        """
+        if not settings.RENDERS_BUCKET:
+            logger.error("GeminiService: RENDERS_BUCKET is not configured. Cannot store image.")
+            return None
+
+        cache_key = _response_cache_key(f"{IMAGEN_MODEL_NAME}:gcs", prompt)
+        cached_uri = self._get_cached_response(cache_key)
+        if cached_uri is not None:
+            return cached_uri, cached_uri.rsplit("/", 1)[-1].removesuffix(".png")
+
+        image_bytes = self._generate_image_bytes(prompt)
+        if image_bytes is None:
+            return None
+
+        try:
+            sha256 = hashlib.sha256(image_bytes).hexdigest()
+            blob_name = f"renders/{sha256}.png"
+            if self._storage_client is None:
+                self._storage_client = storage.Client(project=settings.PROJECT_ID)
+            blob = self._storage_client.bucket(settings.RENDERS_BUCKET).blob(blob_name)
+            blob.upload_from_string(image_bytes, content_type="image/png")
+            gcs_uri = f"gs://{settings.RENDERS_BUCKET}/{blob_name}"
+            self._cache_response(cache_key, gcs_uri)
+            return gcs_uri, sha256
+        except Exception as e:
+            logger.error("Error uploading Imagen render to bucket '%s': %s", settings.RENDERS_BUCKET, e, exc_info=True)
+            return None
+
+    async def generate_image_to_storage_async(self, prompt: str) -> Optional[Tuple[str, str]]:
+        """Asynchronous variant of `generate_image_to_storage`, run in a worker thread."""
+        return await run_blocking(self.generate_image_to_storage, prompt)
+
+    def signed_render_url(self, gcs_uri: str) -> Optional[str]:
+        """
+        Returns a V4 signed HTTPS URL through which a browser can fetch the render stored at
+        `gcs_uri` (as returned by `generate_image_to_storage`) for `RENDER_URL_TTL_SECONDS`,
+        or None if it cannot be signed. Signing uses the service account key locally, without a request.
+        """
+        try:
+            bucket_name, blob_name = gcs_uri.removeprefix("gs://").split("/", 1)
+            if self._storage_client is None:
+                self._storage_client = storage.Client(project=settings.PROJECT_ID)
+            return self._storage_client.bucket(bucket_name).blob(blob_name).generate_signed_url(
+                version="v4",
+                expiration=datetime.timedelta(seconds=RENDER_URL_TTL_SECONDS),
+                method="GET",
+            )
+        except Exception as e:
+            logger.error("Error signing URL for render '%s': %s", gcs_uri, e, exc_info=True)
+            return None
+
+# Process-wide GeminiService instance shared by all agents.
+_gemini_service: Optional[GeminiService] = None
+_gemini_service_lock = threading.Lock()
+
+def get_gemini_service(prediction_service_client: Optional[PredictionServiceClient] = None) -> GeminiService:
+    """
+    Returns the shared GeminiService, creating it on first use.
+    Vertex AI initialization and model loading therefore happen once per process
+    rather than once per agent. `prediction_service_client` is only used by the
+    call that creates the instance.
+    """
+    global _gemini_service
+    if _gemini_service is None:
+        with _gemini_service_lock:
+            if _gemini_service is None: # Re-check, another thread may have created it
+                _gemini_service = GeminiService(prediction_service_client=prediction_service_client)
+    return _gemini_service
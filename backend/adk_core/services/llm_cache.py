@@ -0,0 +1,69 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import redis
+except ImportError: # Redis is optional; without it the in-process cache is used
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """
+    Exact-match cache for model responses, keyed by a hash of the request built by the caller.
+    Backed by Redis when a URL is given, so entries are shared across worker processes and
+    survive restarts; otherwise by an in-process LRU with per-entry expiry.
+    Caching is best-effort: backend errors are reported and treated as cache misses.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: Optional[int] = None, redis_url: Optional[str] = None, namespace: str = "llm_cache"):
+        self.max_entries = max_entries # Bound for the in-process cache; Redis relies on its own eviction policy
+        self.ttl_seconds = ttl_seconds # Default lifetime of an entry, None to keep it until evicted
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            if redis is None:
+                logger.warning("LLMCache: REDIS_URL is set but the 'redis' package is not installed. Using in-process cache.")
+            else:
+                self._redis = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value for `key`, or None if it is absent or expired."""
+        if self._redis is not None:
+            try:
+                return self._redis.get(f"{self.namespace}:{key}")
+            except Exception as e:
+                logger.warning("LLMCache: Redis get failed, treating as a miss: %s", e)
+                return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key) # Mark as most recently used
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        """Stores `value` under `key` for `ttl` seconds, defaulting to the cache's TTL."""
+        ttl = ttl if ttl is not None else self.ttl_seconds
+        if self._redis is not None:
+            try:
+                self._redis.set(f"{self.namespace}:{key}", value, ex=ttl)
+            except Exception as e:
+                logger.warning("LLMCache: Redis set failed, response not cached: %s", e)
+            return
+
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Evict the least recently used entry
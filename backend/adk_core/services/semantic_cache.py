@@ -0,0 +1,46 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+class SemanticLLMCache:
+    """
+    Near-duplicate response cache. A prompt hits when a previously answered prompt in the
+    same namespace (typically the calling agent) and at the same temperature has an
+    embedding with cosine similarity of at least `threshold`, e.g. two projects that only
+    differ in wording. Search is an exact inner product over normalized embeddings;
+    each namespace keeps at most `max_entries` prompts, dropping the oldest first.
+    """
+    def __init__(self, embed_fn: Callable[[str], List[float]], threshold: float = 0.92, max_entries: int = 512):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # (namespace, temperature) -> (embedding matrix with one normalized row per prompt, responses)
+        self._indexes: Dict[Tuple[str, float], Tuple[np.ndarray, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def embed(self, prompt: str) -> np.ndarray:
+        """Returns the normalized embedding of `prompt`."""
+        embedding = np.asarray(self.embed_fn(prompt), dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) or 1.0)
+
+    def lookup(self, namespace: str, temperature: float, embedding: np.ndarray) -> Optional[str]:
+        """Returns the response of the most similar cached prompt, or None if none is similar enough."""
+        with self._lock:
+            index = self._indexes.get((namespace, temperature))
+            if index is None:
+                return None
+            embeddings, responses = index
+            similarities = embeddings @ embedding
+            best = int(np.argmax(similarities))
+            return responses[best] if similarities[best] >= self.threshold else None
+
+    def add(self, namespace: str, temperature: float, embedding: np.ndarray, response: str) -> None:
+        """Caches `response` for the prompt with the given normalized embedding."""
+        with self._lock:
+            embeddings, responses = self._indexes.get(
+                (namespace, temperature), (np.empty((0, embedding.shape[0]), dtype=np.float32), [])
+            )
+            embeddings = np.vstack([embeddings, embedding])[-self.max_entries:]
+            responses = (responses + [response])[-self.max_entries:]
+            self._indexes[(namespace, temperature)] = (embeddings, responses)
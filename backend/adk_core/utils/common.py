@@ -1,24 +1,240 @@
-import json
-from typing import Dict, Any
-
-def format_output_json(data: Dict[str, Any]) -> str:
-    """Formats a dictionary into a pretty-printed JSON string."""
-    return json.dumps(data, indent=2)
-
-def parse_user_input_for_agents(user_input_raw: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Processes raw user input (e.g., from a Pydantic model) into a standardized format
-    that individual agents can easily consume. This acts as a central data hub for agents.
-    """
-    # This structure can be expanded as your project input becomes more complex.
-    # For now, it directly passes the structured input.
-    return {
-        "project_description": user_input_raw.get("project_description", ""),
-        "client_name": user_input_raw.get("client_name", "N/A"),
-        "budget_range": user_input_raw.get("budget_range", "N/A"),
-        "location": user_input_raw.get("location", "unspecified"),
-        "desired_features": user_input_raw.get("desired_features", []),
-        "initial_ideas_url": user_input_raw.get("initial_ideas_url", None),
-        "project_type": user_input_raw.get("project_type", "residential"), # Ensure project_type is passed
-        "project_size": user_input_raw.get("project_size", "medium") # Also pass project_size
-    }
\ No newline at end of file
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import json_repair
+import orjson
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, field, is_dataclass
+from graphlib import TopologicalSorter
+from typing import TYPE_CHECKING, Callable, Dict, Any, Optional, Set, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+if TYPE_CHECKING: # base_agent imports this module
+    from ..agents.base_agent import ConstructionAgent
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Matches the markdown code fences LLMs often wrap JSON output in.
+_JSON_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$', re.MULTILINE)
+
+@dataclass(frozen=True, eq=False)
+class CachedPayload(Mapping):
+    """
+    Read-only wrapper the orchestrator puts around each upstream agent output before
+    handing it to downstream agents. It behaves like the wrapped dict, and `str()` returns
+    its compact JSON, serialized once on first use and shared by every agent that embeds it.
+    """
+    data: Dict[str, Any]
+    _json: Optional[str] = field(default=None, init=False, repr=False)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __str__(self) -> str:
+        if self._json is None:
+            object.__setattr__(self, "_json", orjson.dumps(self.data).decode())
+        return self._json
+
+def _cached_payload_default(obj: Any) -> Any:
+    if isinstance(obj, CachedPayload):
+        return obj.data
+    if is_dataclass(obj) and not isinstance(obj, type): # Slotted agent results
+        return asdict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def payload_json(value: Any) -> str:
+    """
+    Serializes upstream data as compact JSON for embedding in a prompt.
+    CachedPayload values reuse their cached serialization, including when nested.
+    """
+    if isinstance(value, CachedPayload):
+        return str(value)
+    return orjson.dumps(value, default=_cached_payload_default, option=orjson.OPT_PASSTHROUGH_DATACLASS).decode()
+
+def unwrap_payloads(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns a copy of `data` with CachedPayload values replaced by their plain dicts."""
+    return {key: value.data if isinstance(value, CachedPayload) else value for key, value in data.items()}
+
+def format_output_json(data: Dict[str, Any]) -> str:
+    """Formats a dictionary into a pretty-printed JSON string."""
+    return json.dumps(data, indent=2)
+
+def parse_llm_json(llm_response: Optional[str]) -> Dict[str, Any]:
+    """
+    Parses the JSON object in an LLM response. Markdown code fences are stripped first,
+    and almost-valid JSON (e.g. trailing commas, unquoted keys) is repaired instead of rejected.
+    Raises ValueError if there is no response or it does not contain a JSON object.
+    """
+    if llm_response is None:
+        raise ValueError("No LLM response to parse.")
+    cleaned = _JSON_FENCE_RE.sub('', llm_response).strip()
+    try:
+        parsed = orjson.loads(cleaned)
+    except orjson.JSONDecodeError:
+        parsed = json_repair.loads(cleaned)
+    if not isinstance(parsed, dict):
+        raise ValueError("LLM response does not contain a JSON object.")
+    return parsed
+
+def parse_llm_model(llm_response: Optional[str], model: Type[ModelT]) -> ModelT:
+    """
+    Parses and validates an LLM response as `model`. Well-formed JSON, as returned for a
+    `response_schema` request, is decoded straight into the model without an intermediate
+    dict; anything else goes through `parse_llm_json`'s cleanup first.
+    Raises ValueError if there is no response, or ValidationError if it does not match `model`.
+    """
+    if llm_response is None:
+        raise ValueError("No LLM response to parse.")
+    try:
+        return model.model_validate_json(llm_response)
+    except ValidationError:
+        return model.model_validate(parse_llm_json(llm_response))
+
+def _canonical_slot(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, Mapping):
+        return {key: _canonical_slot(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted((_canonical_slot(item) for item in value), key=orjson.dumps)
+    return value
+
+# Matches an amount such as "250k", "1.2M", "1.5 million" or "1,500,000" in free text.
+_AMOUNT_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)(?:\s*(k|m|thousand|million)\b)?', re.IGNORECASE)
+_AMOUNT_MULTIPLIERS = {"k": 1_000, "thousand": 1_000, "m": 1_000_000, "million": 1_000_000}
+
+def bucket_amounts(value: Any, step: int = 100_000) -> Any:
+    """
+    Returns `value` with every amount in it rounded to the nearest `step`, e.g.
+    "$480k - $1.03M" becomes "$500000 - $1000000", so budgets that only differ by small
+    amounts map to the same `template_key`. Numbers are rounded directly and amounts
+    inside strings are rewritten; other values are returned unchanged.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return int(value / step + 0.5) * step
+    if isinstance(value, str):
+        def _bucket(match: re.Match) -> str:
+            amount = float(match.group(1).replace(",", "")) * _AMOUNT_MULTIPLIERS.get((match.group(2) or "").lower(), 1)
+            return str(int(amount / step + 0.5) * step)
+        return _AMOUNT_RE.sub(_bucket, value)
+    return value
+
+def template_id(name: str, *template_texts: str) -> str:
+    """
+    Returns an ID for the prompt template `name` that includes a hash of `template_texts`
+    (its system instruction and prompt template), so `template_key`s, and with them any
+    cached responses, change as soon as the template is edited.
+    """
+    digest = hashlib.blake2b("\0".join(template_texts).encode("utf-8"), digest_size=6).hexdigest()
+    return f"{name}@{digest}"
+
+def template_key(template_id: str, slots: Dict[str, Any]) -> str:
+    """
+    Returns a response cache key text for a prompt built from the template `template_id`
+    (see `template_id`) and `slots`, to pass as `template_key` to GeminiService. Strings are lowercased and
+    whitespace-normalized and lists sorted, so slot values that only differ in such details
+    map to the same key; slots that should not affect the response are simply left out.
+    """
+    return f"{template_id}:{orjson.dumps(_canonical_slot(slots), option=orjson.OPT_SORT_KEYS).decode()}"
+
+def project_id_for(inquiry: Mapping[str, Any]) -> str:
+    """
+    Derives a project ID from the content of a client inquiry (as returned by
+    `parse_user_input_for_agents`), so identical inquiries get the same ID and share
+    cached responses, while different inquiries do not collide.
+    """
+    return "proj_" + hashlib.blake2b(orjson.dumps(dict(inquiry), option=orjson.OPT_SORT_KEYS), digest_size=6).hexdigest()
+
+def parse_user_input_for_agents(user_input_raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Processes raw user input (e.g., from a Pydantic model) into a standardized format
+    that individual agents can easily consume. This acts as a central data hub for agents.
+    """
+    # This structure can be expanded as your project input becomes more complex.
+    # For now, it directly passes the structured input.
+    return {
+        "project_description": user_input_raw.get("project_description", ""),
+        "client_name": user_input_raw.get("client_name", "N/A"),
+        "budget_range": user_input_raw.get("budget_range", "N/A"),
+        "location": user_input_raw.get("location", "unspecified"),
+        "desired_features": user_input_raw.get("desired_features", []),
+        "initial_ideas_url": user_input_raw.get("initial_ideas_url", None),
+        "project_type": user_input_raw.get("project_type", "residential"), # Ensure project_type is passed
+        "project_size": user_input_raw.get("project_size", "medium") # Also pass project_size
+    }
+
+def agent_dependencies(agents: Dict[str, "ConstructionAgent"]) -> Dict[str, Set[str]]:
+    """
+    Derives the dependency graph of a set of agents from their declared `input_keys` and
+    `output_keys`: each agent key maps to the keys of the agents producing its inputs.
+    When several agents produce a key, the first one in `agents` is used. Inputs no agent
+    in the set produces come from the initial project data, if at all.
+    """
+    producers: Dict[str, str] = {}
+    for agent_key, agent in agents.items():
+        for output_key in agent.output_keys:
+            producers.setdefault(output_key, agent_key)
+    return {
+        agent_key: {producers[key] for key in agent.input_keys if producers.get(key, agent_key) != agent_key}
+        for agent_key, agent in agents.items()
+    }
+
+async def _run_agent(agent: "ConstructionAgent", user_input: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one agent, converting an unexpected exception into an "error" status output."""
+    try:
+        return await agent.aprocess_request(user_input)
+    except Exception as e:
+        # Catch unexpected errors during agent processing
+        logger.error("Unexpected exception processing with %s: %s", agent.name, e, exc_info=True)
+        return {
+            "agent_name": agent.name,
+            "status": "error",
+            "message": f"An unexpected error occurred during processing by {agent.name}: {e}"
+        }
+
+async def run_agent_graph(agents: Dict[str, "ConstructionAgent"], user_input: Dict[str, Any], on_output: Callable[[str, Dict[str, Any]], None]) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs `aprocess_request` for a set of agents, each as soon as the agents producing its
+    inputs (see `agent_dependencies`) have finished, so independent branches of the
+    workflow overlap instead of waiting for a whole stage. Agents are I/O-bound on
+    Gemini/Imagen calls, so the wall-clock time approaches that of the longest
+    dependency chain. An agent still runs if one of its dependencies failed.
+    The Gemini requests of `prefetchable` agents are started up front, before their turn.
+
+    Args:
+        agents: Mapping of agent key to agent instance. The dependencies must not form a cycle.
+        user_input: The consolidated input; each agent receives a shallow copy of it as it starts.
+        on_output: Called with each agent's key and output as it finishes, before its
+                   dependents start; it is expected to merge the output into `user_input`.
+    Returns:
+        A dictionary mapping each agent key to that agent's output.
+    """
+    sorter = TopologicalSorter(agent_dependencies(agents))
+    sorter.prepare() # Raises graphlib.CycleError on circular declarations
+    prefetches = [task for task in (agent.start_prefetch(user_input) for agent in agents.values()) if task is not None]
+    running: Dict[asyncio.Task, str] = {}
+    outputs: Dict[str, Dict[str, Any]] = {}
+    while sorter.is_active():
+        for agent_key in sorter.get_ready():
+            logger.info("Calling %s (%s)...", agents[agent_key].name, agent_key)
+            running[asyncio.create_task(_run_agent(agents[agent_key], user_input.copy()))] = agent_key # Pass a copy to avoid modification issues
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            agent_key = running.pop(task)
+            outputs[agent_key] = task.result()
+            on_output(agent_key, outputs[agent_key])
+            sorter.done(agent_key)
+    await asyncio.gather(*prefetches, return_exceptions=True) # Already joined by their agents
+    return outputs
@@ -1,31 +1,49 @@
-from pydantic_settings import BaseSettings, SettingsConfigDict
-import os
-
-class Settings(BaseSettings):
-    """Application settings loaded from environment variables or .env file."""
-    GOOGLE_APPLICATION_CREDENTIALS: str
-    PROJECT_ID: str
-    LOCATION: str = "us-central1" # Example: "us-central1", "europe-west1"
-    GEMINI_MODEL_NAME: str = "gemini-1.5-flash" # Or "gemini-1.5-pro" for more advanced tasks
-
-    # Configure Pydantic to load from .env file
-    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
-
-settings = Settings()
-
-# --- IMPORTANT: Guide for .env file ---
-# This block is for user guidance during setup.
-# In a production environment, ensure these variables are set externally.
-env_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env")
-if not os.path.exists(env_file_path):
-    print("\n--- Setup Warning ---")
-    print(f"'.env' file not found at '{env_file_path}'.")
-    print("Please create one in the 'backend' directory with the following content:")
-    print("-----------------------------------------------------------------")
-    print("GOOGLE_APPLICATION_CREDENTIALS=\"/path/to/your/service-account-key.json\"")
-    print("PROJECT_ID=\"your-gcp-project-id\"")
-    print("# LOCATION=\"us-central1\"")
-    print("# GEMINI_MODEL_NAME=\"gemini-1.5-flash\"")
-    print("-----------------------------------------------------------------")
-    print("Ensure you replace the placeholder values with your actual GCP credentials and project ID.")
-    print("-----------------------------------------------------------------\n")
\ No newline at end of file
+from pydantic_settings import BaseSettings, SettingsConfigDict
+import functools
+import os
+from typing import Optional
+
+class Settings(BaseSettings):
+    """Application settings loaded from environment variables or .env file."""
+    GOOGLE_APPLICATION_CREDENTIALS: str
+    PROJECT_ID: str
+    LOCATION: str = "us-central1" # Example: "us-central1", "europe-west1"
+    GEMINI_MODEL_NAME: str = "gemini-1.5-flash" # Or "gemini-1.5-pro" for more advanced tasks
+    RENDERS_BUCKET: Optional[str] = None # Cloud Storage bucket for Imagen renders; when unset, renders are returned as base64
+    IMAGE_CACHE_DIR: Optional[str] = None # Local directory keeping a copy of every Imagen render, so repeated prompts skip Imagen across restarts; when unset, renders are only cached in memory (or Redis)
+    REDIS_URL: Optional[str] = None # Shared LLM response cache; when unset, responses are cached in process memory
+    LLM_CACHE_TTL_SECONDS: int = 86400 # Lifetime of a cached LLM response
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.5 # Text calls sampled above this temperature are not cached
+    LLM_THREAD_POOL_SIZE: int = 16 # Worker threads for blocking Gemini/Imagen calls made from async code; size to the project's Vertex AI quota
+    LLM_MAX_CONCURRENT_REQUESTS: int = 16 # Gemini text requests allowed in flight at once per event loop
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0 # Upper bound on one Gemini text request, including retries
+    BATCH_PREDICTION_BUCKET: Optional[str] = None # Cloud Storage bucket staging Gemini batch prediction jobs for offline workloads; when unset, batched text requests are sent one by one
+    SEMANTIC_CACHE_THRESHOLD: Optional[float] = None # Cosine similarity (e.g. 0.92) above which a near-duplicate prompt reuses a cached response; when unset, only exact matches are reused
+
+    # Configure Pydantic to load from .env file
+    model_config = SettingsConfigDict(env_file='.env', extra='ignore')
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Returns the application settings, loading them on first use."""
+    return Settings()
+
+settings = get_settings()
+
+# --- IMPORTANT: Guide for .env file ---
+# This block is for user guidance during setup, enabled with CONSTRUCTION_AGENT_SETUP_CHECK=1.
+# In a production environment, ensure these variables are set externally; the check is then
+# skipped, so worker processes do not each probe for the file at startup.
+env_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env")
+if os.getenv("CONSTRUCTION_AGENT_SETUP_CHECK") == "1" and not os.path.exists(env_file_path):
+    print("\n--- Setup Warning ---")
+    print(f"'.env' file not found at '{env_file_path}'.")
+    print("Please create one in the 'backend' directory with the following content:")
+    print("-----------------------------------------------------------------")
+    print("GOOGLE_APPLICATION_CREDENTIALS=\"/path/to/your/service-account-key.json\"")
+    print("PROJECT_ID=\"your-gcp-project-id\"")
+    print("# LOCATION=\"us-central1\"")
+    print("# GEMINI_MODEL_NAME=\"gemini-1.5-flash\"")
+    print("-----------------------------------------------------------------")
+    print("Ensure you replace the placeholder values with your actual GCP credentials and project ID.")
+    print("-----------------------------------------------------------------\n")
@@ -0,0 +1,215 @@
+import asyncio
+import graphlib
+import unittest
+from dataclasses import dataclass
+from typing import List
+
+from pydantic import BaseModel, ValidationError
+
+from backend.adk_core.utils import common
+
+
+class _Answer(BaseModel):
+    summary: str
+    items: List[str]
+
+
+class _StubAgent:
+    """Minimal `ConstructionAgent` whose output adds `output_keys`, recording the input it saw."""
+
+    def __init__(self, name, input_keys=(), output_keys=(), error=None, started=None):
+        self.name = name
+        self.input_keys = tuple(input_keys)
+        self.output_keys = tuple(output_keys)
+        self.error = error
+        self.started = started if started is not None else []
+        self.seen_input = None
+
+    async def aprocess_request(self, user_input):
+        self.started.append(self.name)
+        self.seen_input = user_input
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return {"agent_name": self.name, "status": "success", **{key: f"{self.name}:{key}" for key in self.output_keys}}
+
+    def start_prefetch(self, user_input):
+        return None
+
+
+def _run_graph(agents, user_input=None):
+    """Runs `run_agent_graph`, merging each output into the consolidated input like `process_project`."""
+    consolidated = dict(user_input or {})
+
+    def on_output(agent_key, agent_output):
+        if agent_output.get("status") == "success":
+            consolidated.update({key: value for key, value in agent_output.items() if key not in ("agent_name", "status")})
+
+    return asyncio.run(common.run_agent_graph(agents, consolidated, on_output))
+
+
+class CachedPayloadTest(unittest.TestCase):
+
+    def test_behaves_like_the_wrapped_dict(self):
+        payload = common.CachedPayload({"a": 1, "b": [2, 3]})
+
+        self.assertEqual(payload["a"], 1)
+        self.assertEqual(dict(payload), {"a": 1, "b": [2, 3]})
+        self.assertEqual(len(payload), 2)
+
+    def test_str_is_compact_json_serialized_once(self):
+        payload = common.CachedPayload({"a": 1, "b": [2, 3]})
+
+        self.assertEqual(str(payload), '{"a":1,"b":[2,3]}')
+        self.assertIs(str(payload), str(payload))
+
+    def test_payload_json_embeds_nested_payloads_and_dataclasses(self):
+        @dataclass(slots=True)
+        class Result:
+            status: str
+
+        value = {"plan": common.CachedPayload({"x": 1}), "result": Result("ok")}
+
+        self.assertEqual(common.payload_json(value), '{"plan":{"x":1},"result":{"status":"ok"}}')
+
+    def test_unwrap_payloads_returns_plain_dicts(self):
+        data = {"plan": common.CachedPayload({"x": 1}), "project_id": "proj_1"}
+
+        self.assertEqual(common.unwrap_payloads(data), {"plan": {"x": 1}, "project_id": "proj_1"})
+        self.assertIs(type(common.unwrap_payloads(data)["plan"]), dict)
+
+
+class ParseLLMJsonTest(unittest.TestCase):
+
+    def test_strips_markdown_fences(self):
+        self.assertEqual(common.parse_llm_json('```json\n{"a": 1}\n```'), {"a": 1})
+
+    def test_repairs_almost_valid_json(self):
+        self.assertEqual(common.parse_llm_json('{"a": 1, "b": [1, 2,],}'), {"a": 1, "b": [1, 2]})
+
+    def test_rejects_replies_without_an_object(self):
+        for reply in ("[1, 2]", '"just text"', None):
+            with self.subTest(reply=reply), self.assertRaises(ValueError):
+                common.parse_llm_json(reply)
+
+    def test_parse_llm_model_accepts_well_formed_and_fenced_json(self):
+        for reply in ('{"summary": "ok", "items": ["a"]}', '```json\n{"summary": "ok", "items": ["a"],}\n```'):
+            with self.subTest(reply=reply):
+                self.assertEqual(common.parse_llm_model(reply, _Answer), _Answer(summary="ok", items=["a"]))
+
+    def test_parse_llm_model_rejects_mismatched_json(self):
+        with self.assertRaises(ValidationError):
+            common.parse_llm_model('{"summary": "ok"}', _Answer)
+        with self.assertRaises(ValueError):
+            common.parse_llm_model(None, _Answer)
+
+
+class BucketAmountsTest(unittest.TestCase):
+
+    def test_amounts_in_text_are_rounded_to_the_nearest_step(self):
+        cases = {
+            "$480k - $1.03M": "$500000 - $1000000",
+            "$500,000-$1,000,000": "$500000-$1000000",
+            "1.5 million": "1500000",
+            "$249k": "$200000",
+            "$250k": "$300000",
+        }
+        for text, bucketed in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(common.bucket_amounts(text), bucketed)
+
+    def test_numbers_are_rounded_and_other_values_kept(self):
+        self.assertEqual(common.bucket_amounts(730000), 700000)
+        self.assertEqual(common.bucket_amounts(1234, step=1000), 1000)
+        self.assertIs(common.bucket_amounts(True), True)
+        self.assertIsNone(common.bucket_amounts(None))
+        self.assertEqual(common.bucket_amounts("to be discussed"), "to be discussed")
+
+
+class TemplateKeyTest(unittest.TestCase):
+
+    def test_slots_differing_only_in_case_spacing_or_order_share_a_key(self):
+        key = common.template_key("site", {"location": "London, UK", "features": ["Garden", "garage"]})
+        same = common.template_key("site", {"features": ["GARAGE", "garden"], "location": "  london,   uk"})
+
+        self.assertEqual(key, same)
+
+    def test_different_slot_values_or_templates_get_different_keys(self):
+        key = common.template_key("site", {"location": "London, UK"})
+
+        self.assertNotEqual(key, common.template_key("site", {"location": "Paris, France"}))
+        self.assertNotEqual(key, common.template_key("workforce", {"location": "London, UK"}))
+
+    def test_template_id_changes_with_the_template_text(self):
+        template_id = common.template_id("site", "instruction", "Location: {location}")
+
+        self.assertTrue(template_id.startswith("site@"))
+        self.assertEqual(template_id, common.template_id("site", "instruction", "Location: {location}"))
+        self.assertNotEqual(template_id, common.template_id("site", "new instruction", "Location: {location}"))
+        self.assertNotEqual(template_id, common.template_id("site", "instruction", "Site: {location}"))
+
+
+class AgentDependenciesTest(unittest.TestCase):
+
+    def test_agents_depend_on_the_producers_of_their_inputs(self):
+        agents = {
+            "client": _StubAgent("client", output_keys=["requirements"]),
+            "site": _StubAgent("site", input_keys=["project_id", "requirements"], output_keys=["site_report"]),
+            "design": _StubAgent("design", input_keys=["requirements", "site_report"], output_keys=["concept"]),
+        }
+
+        self.assertEqual(common.agent_dependencies(agents), {"client": set(), "site": {"client"}, "design": {"client", "site"}})
+
+    def test_first_producer_wins_and_own_outputs_are_ignored(self):
+        agents = {
+            "first": _StubAgent("first", output_keys=["report"]),
+            "second": _StubAgent("second", input_keys=["report"], output_keys=["report"]),
+        }
+
+        self.assertEqual(common.agent_dependencies(agents), {"first": set(), "second": {"first"}})
+
+
+class RunAgentGraphTest(unittest.TestCase):
+
+    def test_agents_start_after_their_dependencies_and_see_their_outputs(self):
+        started = []
+        agents = {
+            "design": _StubAgent("design", input_keys=["site_report"], output_keys=["concept"], started=started),
+            "site": _StubAgent("site", input_keys=["requirements"], output_keys=["site_report"], started=started),
+            "client": _StubAgent("client", output_keys=["requirements"], started=started),
+        }
+
+        outputs = _run_graph(agents, {"project_id": "proj_1"})
+
+        self.assertEqual(started, ["client", "site", "design"])
+        self.assertEqual(agents["design"].seen_input["site_report"], "site:site_report")
+        self.assertEqual(agents["design"].seen_input["project_id"], "proj_1")
+        self.assertEqual({key: output["status"] for key, output in outputs.items()}, dict.fromkeys(agents, "success"))
+
+    def test_failed_dependency_still_runs_its_dependents(self):
+        agents = {
+            "site": _StubAgent("site", output_keys=["site_report"], error=RuntimeError("boom")),
+            "design": _StubAgent("design", input_keys=["site_report"], output_keys=["concept"]),
+        }
+
+        with self.assertLogs(common.logger, "ERROR"):
+            outputs = _run_graph(agents)
+
+        self.assertEqual(outputs["site"]["status"], "error")
+        self.assertIn("boom", outputs["site"]["message"])
+        self.assertEqual(outputs["design"]["status"], "success")
+        self.assertNotIn("site_report", agents["design"].seen_input)
+
+    def test_circular_dependencies_are_rejected(self):
+        agents = {
+            "a": _StubAgent("a", input_keys=["b_out"], output_keys=["a_out"]),
+            "b": _StubAgent("b", input_keys=["a_out"], output_keys=["b_out"]),
+        }
+
+        with self.assertRaises(graphlib.CycleError):
+            _run_graph(agents)
+        self.assertEqual(agents["a"].started, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+# Settings are loaded on import and require these
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "/dev/null")
+os.environ.setdefault("PROJECT_ID", "test-project")
+
+from backend.adk_core.services import gemini_service
+
+
+def _response(text):
+    """Builds a stub GenerateContentResponse whose first candidate holds `text`."""
+    part = mock.Mock(text=text)
+    return mock.Mock(candidates=[mock.Mock(content=mock.Mock(parts=[part]))])
+
+
+class _StubbedServiceTestCase(unittest.TestCase):
+    """Builds a GeminiService against stubbed Vertex AI models."""
+
+    def setUp(self):
+        for name in ("aiplatform", "ImageGenerationModel", "caching", "PreviewGenerativeModel"):
+            patcher = mock.patch.object(gemini_service, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.service = gemini_service.GeminiService()
+
+
+class GenerateTextSystemInstructionTest(_StubbedServiceTestCase):
+    """`generate_text` with a `system_instruction`, against stubbed Vertex AI models."""
+
+    def test_instruction_is_served_from_context_cache(self):
+        cached_content = mock.Mock()
+        cached_content.name = "cachedContents/123"
+        self.caching.CachedContent.create.return_value = cached_content
+        cached_model = self.PreviewGenerativeModel.from_cached_content.return_value
+        cached_model.generate_content.return_value = _response("cached answer")
+
+        text = self.service.generate_text("Project details", system_instruction="You are an expert.")
+
+        self.assertEqual(text, "cached answer")
+        self.PreviewGenerativeModel.from_cached_content.assert_called_once_with(cached_content="cachedContents/123")
+        self.assertEqual(cached_model.generate_content.call_args.args[0], "Project details")
+        self.service.gemini_model.generate_content.assert_not_called()
+
+    def test_instruction_is_registered_once_across_calls(self):
+        self.caching.CachedContent.create.return_value.name = "cachedContents/123"
+        cached_model = self.PreviewGenerativeModel.from_cached_content.return_value
+        cached_model.generate_content.return_value = _response("cached answer")
+
+        for details in ("Project A", "Project B", "Project C"):
+            self.service.generate_text(details, temperature=0.9, system_instruction="You are an expert.")
+
+        self.caching.CachedContent.create.assert_called_once()
+        self.assertEqual(
+            [call.args[0] for call in cached_model.generate_content.call_args_list],
+            ["Project A", "Project B", "Project C"],
+        )
+
+    def test_instruction_is_sent_inline_when_context_cache_is_unavailable(self):
+        self.caching.CachedContent.create.side_effect = RuntimeError("prefix too short to cache")
+        self.service.gemini_model.generate_content.return_value = _response("inline answer")
+
+        text = self.service.generate_text("Project details", system_instruction="You are an expert.")
+
+        self.assertEqual(text, "inline answer")
+        self.assertEqual(
+            self.service.gemini_model.generate_content.call_args.args[0],
+            "You are an expert.\n\nProject details",
+        )
+
+
+class ResponseCacheTemperatureTest(_StubbedServiceTestCase):
+    """`generate_text` replays cached responses only up to `LLM_CACHE_MAX_TEMPERATURE`."""
+
+    def test_low_temperature_responses_are_replayed(self):
+        self.service.gemini_model.generate_content.return_value = _response("answer")
+
+        first = self.service.generate_text("Project details", temperature=0.2)
+        second = self.service.generate_text("Project   details", temperature=0.2) # Whitespace is normalized
+
+        self.assertEqual((first, second), ("answer", "answer"))
+        self.service.gemini_model.generate_content.assert_called_once()
+
+    def test_high_temperature_calls_are_not_cached(self):
+        temperature = gemini_service.settings.LLM_CACHE_MAX_TEMPERATURE + 0.1
+        self.service.gemini_model.generate_content.side_effect = [_response("first sample"), _response("second sample")]
+
+        first = self.service.generate_text("Project details", temperature=temperature)
+        second = self.service.generate_text("Project details", temperature=temperature)
+
+        self.assertEqual((first, second), ("first sample", "second sample"))
+        self.assertIsNone(self.service._text_cache_key("Project details", temperature))
+
+
+class GenerateTextAsyncSingleFlightTest(_StubbedServiceTestCase):
+    """Identical `generate_text_async` calls in flight at the same time share one request."""
+
+    def test_identical_concurrent_calls_share_one_request(self):
+        requested = []
+
+        async def generate(prompt, *args):
+            requested.append(prompt)
+            await asyncio.sleep(0) # Let the other calls arrive while this one is in flight
+            return f"answer to {prompt}"
+        self.service._generate_text_async = generate
+
+        async def run_calls():
+            return await asyncio.gather(
+                self.service.generate_text_async("Project A"),
+                self.service.generate_text_async("Project A"),
+                self.service.generate_text_async("Project B"),
+            )
+
+        self.assertEqual(asyncio.run(run_calls()), ["answer to Project A", "answer to Project A", "answer to Project B"])
+        self.assertEqual(requested, ["Project A", "Project B"])
+        self.assertEqual(self.service._inflight, {})
+
+    def test_calls_after_the_shared_one_finished_send_their_own_request(self):
+        requested = []
+
+        async def generate(prompt, *args):
+            requested.append(prompt)
+            return "answer"
+        self.service._generate_text_async = generate
+
+        async def run_calls():
+            await self.service.generate_text_async("Project A")
+            await self.service.generate_text_async("Project A")
+
+        asyncio.run(run_calls())
+
+        self.assertEqual(requested, ["Project A", "Project A"])
+
+
+class EncodedImageBytesTest(unittest.TestCase):
+    """`_encoded_image_bytes` on Imagen images with and without the SDK's private bytes attribute."""
+
+    def test_private_bytes_are_returned_as_is(self):
+        image = mock.Mock(_image_bytes=b"\x89PNG cached")
+
+        self.assertEqual(gemini_service._encoded_image_bytes(image), b"\x89PNG cached")
+        image.save.assert_not_called()
+
+    def test_image_is_saved_when_private_bytes_are_absent(self):
+        def save(location):
+            with open(location, "wb") as image_file:
+                image_file.write(b"\x89PNG saved")
+        image = mock.Mock(spec=["save"])
+        image.save.side_effect = save
+
+        self.assertEqual(gemini_service._encoded_image_bytes(image), b"\x89PNG saved")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from backend.adk_core.services import llm_cache
+from backend.adk_core.services.llm_cache import LLMCache
+
+
+class LLMCacheTest(unittest.TestCase):
+    """The in-process `LLMCache` backend (no Redis URL)."""
+
+    def test_returns_stored_values_and_misses_unknown_keys(self):
+        cache = LLMCache(max_entries=2)
+        cache.set("a", "response a")
+
+        self.assertEqual(cache.get("a"), "response a")
+        self.assertIsNone(cache.get("b"))
+
+    def test_evicts_the_least_recently_used_entry(self):
+        cache = LLMCache(max_entries=2)
+        cache.set("a", "response a")
+        cache.set("b", "response b")
+        cache.get("a") # "b" is now the least recently used
+        cache.set("c", "response c")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "response a")
+        self.assertEqual(cache.get("c"), "response c")
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = LLMCache(max_entries=4, ttl_seconds=60)
+        with mock.patch.object(llm_cache.time, "monotonic", return_value=1000.0):
+            cache.set("default", "expires at 1060")
+            cache.set("short", "expires at 1010", ttl=10)
+        with mock.patch.object(llm_cache.time, "monotonic", return_value=1030.0):
+            self.assertEqual(cache.get("default"), "expires at 1060")
+            self.assertIsNone(cache.get("short"))
+        with mock.patch.object(llm_cache.time, "monotonic", return_value=1060.0):
+            self.assertIsNone(cache.get("default"))
+
+    def test_entries_without_ttl_are_kept_until_evicted(self):
+        cache = LLMCache(max_entries=1)
+        with mock.patch.object(llm_cache.time, "monotonic", return_value=1000.0):
+            cache.set("a", "response a")
+        with mock.patch.object(llm_cache.time, "monotonic", return_value=10.0 ** 9):
+            self.assertEqual(cache.get("a"), "response a")
+
+    def test_redis_url_without_redis_package_falls_back_to_process_memory(self):
+        with mock.patch.object(llm_cache, "redis", None), self.assertLogs(llm_cache.logger, "WARNING"):
+            cache = LLMCache(max_entries=1, redis_url="redis://localhost:6379/0")
+        cache.set("a", "response a")
+
+        self.assertEqual(cache.get("a"), "response a")
+
+
+if __name__ == "__main__":
+    unittest.main()
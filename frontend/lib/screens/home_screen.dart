@@ -223,11 +223,20 @@ class _HomeScreenState extends State<HomeScreen> {
           return ExpansionTile(
             title: Text('Digital Twin Output', style: Theme.of(context).textTheme.titleMedium),
             children: [
-              _buildImageDisplay('Exterior Render', digitalTwinOutput['full_exterior_render_base64']),
-              _buildImageDisplay('Interior Render', digitalTwinOutput['full_interior_render_base64']),
+              _buildImageDisplay('Exterior Render', digitalTwinOutput['full_exterior_render_base64'], imageUrl: digitalTwinOutput['exterior_render_url']),
+              _buildImageDisplay('Interior Render', digitalTwinOutput['full_interior_render_base64'], imageUrl: digitalTwinOutput['interior_render_url']),
               _buildKeyValueDisplay(digitalTwinOutput),
             ],
           );
+        } else if (entry.key == 'architectural_concept' && entry.value is Map<String, dynamic>) {
+          final architecturalConcept = entry.value as Map<String, dynamic>;
+          return ExpansionTile(
+            title: Text(_formatKey(entry.key), style: Theme.of(context).textTheme.titleMedium),
+            children: [
+              _buildImageDisplay('Conceptual Render', architecturalConcept['full_conceptual_render_base64'], imageUrl: architecturalConcept['conceptual_render_url']),
+              _buildKeyValueDisplay(architecturalConcept),
+            ],
+          );
         } else if (entry.value is Map<String, dynamic>) {
           // For other nested JSON objects
           return ExpansionTile(
@@ -264,8 +273,8 @@ class _HomeScreenState extends State<HomeScreen> {
       child: Column(
         crossAxisAlignment: CrossAxisAlignment.start,
         children: data.entries.map((itemEntry) {
-          if (itemEntry.key.contains('_base64') && itemEntry.value is String) {
-            // Skip full base64 string display here, handled by _buildImageDisplay
+          if ((itemEntry.key.contains('_base64') || itemEntry.key.endsWith('_render_url')) && itemEntry.value is String) {
+            // Skip full base64 strings and signed render URLs here, handled by _buildImageDisplay
             return const SizedBox.shrink();
           }
           return Text('${_formatKey(itemEntry.key)}: ${itemEntry.value.toString()}');
@@ -274,7 +283,23 @@ class _HomeScreenState extends State<HomeScreen> {
     );
   }
 
-  Widget _buildImageDisplay(String title, String? base64String) {
+  Widget _buildImageDisplay(String title, String? base64String, {String? imageUrl}) {
+    if (imageUrl != null && imageUrl.isNotEmpty && imageUrl != 'N/A') {
+      // Render stored in Cloud Storage, fetched through its signed URL
+      return Padding(
+        padding: const EdgeInsets.symmetric(vertical: 8.0),
+        child: Column(
+          crossAxisAlignment: CrossAxisAlignment.start,
+          children: [
+            Text(title, style: const TextStyle(fontWeight: FontWeight.bold)),
+            const SizedBox(height: 8),
+            Image.network(imageUrl, fit: BoxFit.contain, errorBuilder: (context, error, stackTrace) {
+              return Text('Failed to load image for $title: $error');
+            }),
+          ],
+        ),
+      );
+    }
     if (base64String == null || base64String.isEmpty || base64String == 'N/A') {
       return Padding(
         padding: const EdgeInsets.symmetric(vertical: 8.0),